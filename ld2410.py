@@ -1,7 +1,30 @@
 # HLK-LD2410 B et C  (Microwave-based human/object presence sensor) 
 #rev 1 DUCROS christian janvier 2024 à partir du fichier 
 #rev 1 - shabaz - May 2023
-import  utime
+try :
+    import  utime
+except ImportError : #CPython (PC linux) : équivalents des fonctions utime utilisées
+    import time as _time
+    class utime :
+        sleep = staticmethod(_time.sleep)
+        @staticmethod
+        def sleep_ms(ms):
+            _time.sleep(ms / 1000)
+        @staticmethod
+        def ticks_ms():
+            return int(_time.monotonic() * 1000)
+        @staticmethod
+        def ticks_add(ticks, delta):
+            return ticks + delta
+        @staticmethod
+        def ticks_diff(ticks1, ticks2):
+            return ticks1 - ticks2
+
+from array import array
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
 
 #------------ 2.1 Command protocol frame format---------------
 HEADER = bytes([0xfd, 0xfc, 0xfb, 0xfa])
@@ -20,8 +43,16 @@ REPORT_HEADER = bytes([0xf4, 0xf3, 0xf2, 0xf1])
 # bytes 12-13 are the stationary target distance in cm, little endian
 # byte 14 is the stationary target energy
 # bytes 15-16 are the detection distance in cm, little endian
+# Engineering mode (byte 4 = 0x23, byte 6 = 0x01) adds after byte 16:
+# byte 17 is the maximum moving distance gate N, byte 18 the maximum stationary gate N
+# bytes 19-27 are the moving energy of gates 0..N, bytes 28-36 the stationary energy
+# byte 37 is the light sensor value, byte 38 the OUT pin state
 REPORT_TERMINATOR = bytes([0xf8, 0xf7, 0xf6, 0xf5])
 
+#2.2.9 index de vitesse série -> baudrate
+BAUDRATES = {0x0001: 9600, 0x0002: 19200, 0x0003: 38400, 0x0004: 57600,
+             0x0005: 115200, 0x0006: 230400, 0x0007: 256000, 0x0008: 460800}
+
 NULLDATA = bytes([0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]) #no response --> ack = 0 donc failure
 
 STATE_NO_TARGET = 0
@@ -30,22 +61,532 @@ STATE_STATIONARY_TARGET = 2
 STATE_COMBINED_TARGET = 3
 TARGET_NAME = ["no_target", "moving_target", "stationary_target", "combined_target"]
 
+REPORT_MAX_LEN = 64 #trame engineering = 45 octets, au dela c'est une longueur corrompue
+
+STATUS_TIMEOUT = -1 #CommandResult.status quand aucun ACK n'est reçu
+
+#----------- résultat d'une commande (trame ACK décodée) ------------
+# status : 0 = succès, 1 = échec (octets 8-9 de l'ACK), STATUS_TIMEOUT = pas d'ACK
+# payload : données de l'ACK après le statut, frame : trame ACK complète
+# values : champs décodés selon le registre COMMANDS (LD2410.call), sinon None
+class CommandResult() :
+    __slots__ = ("cmd", "status", "frame", "attempts", "latency_ms", "values")
+
+    def __init__(self, cmd, status, frame, attempts, latency_ms):
+        self.cmd = cmd
+        self.status = status
+        self.frame = frame
+        self.attempts = attempts
+        self.latency_ms = latency_ms
+        self.values = None
+
+    @property
+    def ok(self):
+        return self.status == 0
+
+    @property
+    def payload(self):
+        return self.frame[10:-4] if self.status != STATUS_TIMEOUT else b''
+
+#----------- compteurs et histogrammes du pilote ------------
+# Mis à jour à chaque trame / commande (quelques additions), lus par snapshot().
+# hook(event, data) optionnel, appelé pour "frame" (Measurement), "reject"
+# (raison) et "command" (CommandResult).
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500) #bornes hautes, + une case au-delà
+
+class Stats() :
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.reset()
+
+    def reset(self):
+        self.frames = 0          #trames de rapport décodées
+        self.rejected = {}       #raison -> nb de trames rejetées par decode_report
+        self.bytes_read = 0
+        self.commands = {}       #cmd -> [nb, nb sans ACK, somme ms, max ms, histogramme...]
+        self.last_frame_ms = None #utime.ticks_ms() de la dernière trame décodée
+
+    def frame(self, meas):
+        self.frames += 1
+        self.last_frame_ms = utime.ticks_ms()
+        if self.hook is not None :
+            self.hook("frame", meas)
+
+    def reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        if self.hook is not None :
+            self.hook("reject", reason)
+
+    def command(self, result):
+        entry = self.commands.get(result.cmd)
+        if entry is None :
+            entry = self.commands[result.cmd] = [0, 0, 0, 0] + [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        entry[0] += 1
+        if result.status == STATUS_TIMEOUT :
+            entry[1] += 1
+        else :
+            latency = result.latency_ms
+            entry[2] += latency
+            if latency > entry[3] :
+                entry[3] = latency
+            k = 0
+            while k < len(LATENCY_BUCKETS_MS) and latency > LATENCY_BUCKETS_MS[k] :
+                k += 1
+            entry[4 + k] += 1
+        if self.hook is not None :
+            self.hook("command", result)
+
+    #âge de la dernière mesure en ms, None si aucune trame
+    def meas_age_ms(self):
+        if self.last_frame_ms is None :
+            return None
+        return utime.ticks_diff(utime.ticks_ms(), self.last_frame_ms)
+
+    def snapshot(self, resync=0):
+        commands = {}
+        for cmd, entry in self.commands.items():
+            acks = entry[0] - entry[1]
+            commands[cmd] = {
+                "count": entry[0],
+                "timeouts": entry[1],
+                "mean_ms": entry[2] / acks if acks else None,
+                "max_ms": entry[3],
+                "histogram": entry[4:] }
+        return {
+            "frames": self.frames,
+            "rejected": dict(self.rejected),
+            "bytes_read": self.bytes_read,
+            "resync": resync,
+            "commands": commands,
+            "meas_age_ms": self.meas_age_ms() }
+
+GATE_COUNT = 9 #portes 0 à 8
+ALL_GATES = 0xFFFF #distance_gate_sensitivity_configuration : toutes les portes
+
+#----------- configuration du capteur ------------
+# Sert de configuration lue (décodage de l'ACK 2.2.4) et de configuration
+# voulue pour apply_config : un champ à None n'est pas modifié.
+# motion_sensitivity / standstill_sensitivity : une valeur par porte (9 valeurs)
+# resolution : 0x0000 = 0.75m, 0x0001 = 0.2m (comme distance_resolution_setting)
+class SensorConfig() :
+    __slots__ = ("max_moving_gate", "max_stationary_gate", "no_one_duration",
+                 "motion_sensitivity", "standstill_sensitivity", "resolution")
+
+    def __init__(self, max_moving_gate=None, max_stationary_gate=None, no_one_duration=None,
+                 motion_sensitivity=None, standstill_sensitivity=None, resolution=None):
+        self.max_moving_gate = max_moving_gate
+        self.max_stationary_gate = max_stationary_gate
+        self.no_one_duration = no_one_duration
+        self.motion_sensitivity = motion_sensitivity
+        self.standstill_sensitivity = standstill_sensitivity
+        self.resolution = resolution
+
+    def __eq__(self, other):
+        for name in SensorConfig.__slots__ :
+            if getattr(self, name) != getattr(other, name) :
+                return False
+        return True
+
+    #copie où les champs non None de desired remplacent ceux de self
+    def merged(self, desired):
+        config = self.copy()
+        for name in SensorConfig.__slots__ :
+            value = getattr(desired, name)
+            if value is not None :
+                #séquences (list, tuple, array) recopiées en list modifiable
+                setattr(config, name, value if isinstance(value, int) else list(value))
+        return config
+
+    def copy(self):
+        return SensorConfig(self.max_moving_gate, self.max_stationary_gate, self.no_one_duration,
+                            None if self.motion_sensitivity is None else list(self.motion_sensitivity),
+                            None if self.standstill_sensitivity is None else list(self.standstill_sensitivity),
+                            self.resolution)
+
+#décode la trame ACK de read_parameter (2.2.4), None si elle est invalide
+# payload : aa, N (porte max = 8), porte max mouvement, porte max immobile,
+#           sensibilités mouvement 0..N, sensibilités immobile 0..N, durée (2 octets)
+def decode_parameters(response):
+    if len(response) < 38 or response[6] != 0x61 or response[8] or response[10] != 0xaa or response[11] != GATE_COUNT - 1 :
+        return None
+    values = COMMANDS["read_parameter"].decode(response)
+    return SensorConfig(values["max_moving_gate"], values["max_stationary_gate"], values["no_one_duration"],
+                        list(values["motion_sensitivity"]), list(values["standstill_sensitivity"]))
+
+#champs de l'ACK 2.2.8 -> 'V1.02.22062416'
+def firmware_string(version):
+    return 'V%x.%02x.%08x' % (version["major"], version["minor"], version["build"])
+
+#mot de passe bluetooth (entier 0x48694C696E6B = 'HiLink') -> 6 octets
+def password_bytes(password):
+    # Convertir le password hexadécimal en une chaîne hexadécimale sans le préfixe '0x'
+    password_string = hex(password)[2:]
+    # Assurer que la longueur de la chaîne hexadécimale est un multiple de 2
+    if len(password_string) % 2 != 0:
+        password_string = '0' + password_string
+    # Séparer la chaîne hexadécimale en blocs de 2 caractères et convertir chaque bloc en entier hexadécimal
+    password_octets = [int(password_string[i:i+2], 16) for i in range(0, len(password_string), 2)]
+    return bytes(password_octets[:6])
+
+#----------- registre des commandes (2.2.x) ------------
+# Chaque commande : code, disposition des paramètres (format struct little
+# endian + liste où un entier est une valeur constante et un nom un argument),
+# disposition des données de l'ACK (format struct + noms des champs).
+# La trame est construite une fois (en-tête, longueur, code, constantes,
+# terminateur) ; build() n'écrit que les arguments dans ce buffer.
+# Nouvelle commande = nouvelle ligne register(...) ; LD2410.call(nom, *args).
+class Command() :
+    __slots__ = ("name", "code", "frame", "slots", "response", "fields")
+
+    def __init__(self, name, code, layout="", params=(), response="", fields=()):
+        self.name = name
+        self.code = code
+        size = struct.calcsize("<" + layout)
+        self.frame = bytearray(HEADER + bytes([2 + size, 0x00, code & 0x00FF, (code & 0xFF00) >> 8])
+                               + bytes(size) + TERMINATOR)
+        self.slots = []  #(format, position) de chaque argument
+        formats = []     #un format par paramètre ("6s" compte pour un)
+        count = ""
+        for c in layout :
+            if c in "0123456789" :
+                count += c
+            else :
+                formats.append("<" + count + c)
+                count = ""
+        offset = 8
+        for k in range(len(params)):
+            fmt = formats[k]
+            if isinstance(params[k], int) :
+                struct.pack_into(fmt, self.frame, offset, params[k])
+            else :
+                self.slots.append((fmt, offset))
+            offset += struct.calcsize(fmt)
+        self.response = "<" + response if response else None
+        self.fields = fields
+
+    #remplit la trame préconstruite avec les arguments et la rend
+    def build(self, *args):
+        frame = self.frame
+        slots = self.slots
+        for k in range(len(slots)):
+            struct.pack_into(slots[k][0], frame, slots[k][1], args[k])
+        return frame
+
+    #données de l'ACK -> {champ: valeur}, None si la commande ne rend rien
+    def decode(self, response):
+        if self.response is None :
+            return None
+        return dict(zip(self.fields, struct.unpack_from(self.response, response, 10)))
+
+COMMANDS = {}
+
+def register(name, code, layout="", params=(), response="", fields=()):
+    COMMANDS[name] = Command(name, code, layout, params, response, fields)
+
+#layout : un format struct par paramètre (H = mot, I = valeur 4 octets, 6s = 6 octets)
+register("enable_config", 0x00FF, "H", (0x0001,), "HH", ("protocol_version", "buffer_size"))
+register("end_config", 0x00FE)
+register("Maximum_distance_gate_and_unoccupied_duration_parameters_configuration", 0x0060, "HIHIHI",
+         (0x0000, "maximum_mouvement_distance_door", 0x0001, "maximum_resting_distance_door", 0x0002, "no_one_duration"))
+register("read_parameter", 0x0061, response="BBBB9s9sH",
+         fields=("header", "max_gate", "max_moving_gate", "max_stationary_gate",
+                 "motion_sensitivity", "standstill_sensitivity", "no_one_duration"))
+register("enable_engineering_mode", 0x0062)
+register("end_engineering_mode", 0x0063)
+register("distance_gate_sensitivity_configuration", 0x0064, "HIHIHI",
+         (0x0000, "distance_gate", 0x0001, "motion_sensitivity_value", 0x0002, "standstill_sensitivity_value"))
+register("read_firmware_version", 0x00A0, response="HBBI", fields=("firmware_type", "minor", "major", "build"))
+register("set_serial_port_baud_rate", 0x00A1, "H", ("baudrate",))
+register("restore_factory_settings", 0x00A2)
+register("reboot_module", 0x00A3)
+register("bluetooth_setting", 0x00A4, "H", ("on_off",))
+register("get_mac_address", 0x00A5, "H", (0x0001,), "6s", ("mac",))
+register("obtaining_bluetooth_permissions", 0x00A8, "6s", ("password",))
+register("set_bluetooth_password", 0x00A9, "6s", ("password",))
+register("distance_resolution_setting", 0x00AA, "H", ("distance",))
+register("query_distance_resolution_setting", 0x00AB, response="H", fields=("resolution",))
+
+#----------- identité du module (cache par port) ------------
+# firmware, MAC, protocole et configuration lus en une seule session
+# (LD2410.identify) ; config est une copie de LD2410.config, remise à jour
+# par les commandes de configuration du même port (setters, apply_config,
+# verify_config) pour ne jamais contredire le module
+class Identity() :
+    __slots__ = ("port", "firmware_type", "firmware", "mac", "protocol_version", "buffer_size", "config")
+
+    def __init__(self, port=None, firmware_type=None, firmware=None, mac=None,
+                 protocol_version=None, buffer_size=None, config=None):
+        self.port = port
+        self.firmware_type = firmware_type
+        self.firmware = firmware                  #'V1.02.22062416'
+        self.mac = mac                            #6 octets
+        self.protocol_version = protocol_version  #réponse de enable_config
+        self.buffer_size = buffer_size
+        self.config = config                      #SensorConfig, résolution comprise
+
+    @property
+    def mac_string(self):
+        return ':'.join(['%02x' % b for b in self.mac])
+
+    #dict sérialisable en JSON (save_identities)
+    def to_dict(self):
+        config = self.config
+        return {"port": self.port, "firmware_type": self.firmware_type, "firmware": self.firmware,
+                "mac": self.mac_string, "protocol_version": self.protocol_version, "buffer_size": self.buffer_size,
+                "config": None if config is None else [getattr(config, name) for name in SensorConfig.__slots__]}
+
+    @staticmethod
+    def from_dict(d):
+        config = d["config"]
+        return Identity(d["port"], d["firmware_type"], d["firmware"],
+                        bytes([int(x, 16) for x in d["mac"].split(':')]),
+                        d["protocol_version"], d["buffer_size"], None if config is None else SensorConfig(*config))
+
+#port -> Identity, vidé pour un port par restore_factory_settings et reboot_module
+IDENTITY_CACHE = {}
+
+# cache sur fichier JSON : après un redémarrage de la passerelle,
+# load_identities() évite une session de configuration par capteur
+def save_identities(path):
+    import json
+    with open(path, 'w') as f :
+        json.dump([identity.to_dict() for identity in IDENTITY_CACHE.values()], f)
+
+def load_identities(path):
+    import json
+    try :
+        with open(path) as f :
+            entries = json.load(f)
+    except (OSError, ValueError) :
+        return 0
+    for d in entries :
+        IDENTITY_CACHE[d["port"]] = Identity.from_dict(d)
+    return len(entries)
+
+#identité de chaque capteur (liste de LD2410), {port: Identity ou 0 si échec} ;
+#un capteur sans port est rangé sous l'objet LD2410 lui-même
+def identify_all(sensors, refresh=False):
+    identities = {}
+    for sensor in sensors :
+        identities[sensor.port if sensor.port is not None else sensor] = sensor.identify(refresh)
+    return identities
+
+#----------- mesure (record compact, réutilisé à chaque trame) ------------
+# Remplace le dict self.meas : pas de réallocation des entrées à chaque trame.
+# L'accès self.meas["state"] reste possible pour le code existant.
+# Les champs engineering ne sont mis à jour que par les trames engineering ;
+# les énergies par porte sont dans des array('B') de taille fixe, réécrits sur place.
+class Measurement() :
+    __slots__ = ("state", "moving_distance", "moving_energy",
+                 "stationary_distance", "stationary_energy", "detection_distance",
+                 "engineering", "max_moving_gate", "max_stationary_gate",
+                 "moving_gate_energy", "stationary_gate_energy", "light", "out_pin")
+
+    def __init__(self):
+        self.moving_gate_energy = array('B', bytes(GATE_COUNT))
+        self.stationary_gate_energy = array('B', bytes(GATE_COUNT))
+        self.clear()
+
+    def clear(self):
+        self.state = STATE_NO_TARGET
+        self.moving_distance = 0
+        self.moving_energy = 0
+        self.stationary_distance = 0
+        self.stationary_energy = 0
+        self.detection_distance = 0
+        self.engineering = False
+        self.max_moving_gate = 0
+        self.max_stationary_gate = 0
+        self.light = 0
+        self.out_pin = 0
+        for gate in range(GATE_COUNT):
+            self.moving_gate_energy[gate] = 0
+            self.stationary_gate_energy[gate] = 0
+
+    #copie indépendante (self.meas est réécrit à chaque trame)
+    def copy(self):
+        meas = Measurement()
+        for name in Measurement.__slots__ :
+            value = getattr(self, name)
+            if isinstance(value, array) :
+                getattr(meas, name)[:] = value
+            else :
+                setattr(meas, name, value)
+        return meas
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+#décode une trame de rapport dans meas, rend "" si ok sinon la raison du rejet
+def decode_report(meas, data, offset=0):
+    d = offset
+    # sanity checks
+    if len(data) - d < 23:
+        return "frame length is too short"
+    if data[d] != 0xf4 or data[d+1] != 0xf3 or data[d+2] != 0xf2 or data[d+3] != 0xf1:
+        return "frame header is incorrect"
+    # Check if data[4] (frame length) is valid. It must be 0x0d or 0x23
+    # depending on if we are in basic mode or engineering mode
+    if data[d+4] != 0x0d and data[d+4] != 0x23:
+        return "frame length is incorrect"
+    # data[7] must be report 'head' value 0xaa
+    if data[d+7] != 0xaa:
+        return "frame report head value is incorrect"
+    engineering = data[d+6] == 0x01 and data[d+4] == 0x23
+    if engineering :
+        moving_gates = data[d+17] + 1
+        stationary_gates = data[d+18] + 1
+        m = d + 19
+        st = m + moving_gates
+        if moving_gates > GATE_COUNT or stationary_gates > GATE_COUNT or len(data) < st + stationary_gates + 2 + 6 :
+            return "engineering frame gate count is incorrect"
+    # sanity checks passed. Store the sensor data in meas
+    meas.state = data[d+8]
+    meas.moving_distance = data[d+9] | (data[d+10] << 8)
+    meas.moving_energy = data[d+11]
+    meas.stationary_distance = data[d+12] | (data[d+13] << 8)
+    meas.stationary_energy = data[d+14]
+    meas.detection_distance = data[d+15] | (data[d+16] << 8)
+    meas.engineering = engineering
+    if engineering :
+        meas.max_moving_gate = moving_gates - 1
+        meas.max_stationary_gate = stationary_gates - 1
+        energy = meas.moving_gate_energy
+        for gate in range(moving_gates):
+            energy[gate] = data[m+gate]
+        energy = meas.stationary_gate_energy
+        for gate in range(stationary_gates):
+            energy[gate] = data[st+gate]
+        extra = st + stationary_gates
+        meas.light = data[extra]
+        meas.out_pin = data[extra+1]
+    return ""
+
+#----------- décodage continu des trames de rapport ------------
+# Le capteur émet ses rapports en continu (~10 Hz). Le décodeur accepte des
+# morceaux de flux UART de taille quelconque, retrouve les limites
+# REPORT_HEADER ... REPORT_TERMINATOR même coupées entre deux lectures et
+# rend chaque trame complète (basic ou engineering).
+# Avec acks=True il rend aussi les trames ACK de commande HEADER ... TERMINATOR
+# (premier octet 0xfd au lieu de 0xf4).
+# Buffer fixe préalloué + memoryview : readinto() remplit directement le
+# buffer, next_frame() rend la position de la trame dans self.buf (pas de copie).
+class ReportDecoder() :
+
+    def __init__(self, size=256, max_len=REPORT_MAX_LEN, acks=False):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.max_len = max_len
+        self.acks = acks
+        self.start = 0     #début des octets non traités
+        self.end = 0       #fin des octets reçus
+        self.frame_len = 0 #longueur de la dernière trame rendue par next_frame
+        self.frames = 0    #nb de trames complètes rendues
+        self.resync = 0    #nb d'octets ignorés pour se resynchroniser
+
+    def reset(self):
+        self.start = 0
+        self.end = 0
+
+    #ramène les octets non traités en début de buffer
+    def compact(self):
+        if self.start :
+            n = self.end - self.start
+            if n :
+                self.buf[0:n] = self.mv[self.start:self.end]
+            self.start = 0
+            self.end = n
+        if self.end == len(self.buf) :
+            #buffer plein sans trame valide : on repart à vide
+            self.resync += self.end
+            self.end = 0
+
+    #lecture UART directement dans le buffer, rend le nb d'octets lus
+    #(buffer vide : self.mv sans tranche, pas de memoryview allouée)
+    def readinto(self, ser):
+        self.compact()
+        n = ser.readinto(self.mv[self.end:] if self.end else self.mv)
+        if n :
+            self.end += n
+            return n
+        return 0
+
+    #copie un morceau de flux dans le buffer, rend le nb d'octets acceptés
+    def write(self, chunk, pos=0):
+        self.compact()
+        n = min(len(chunk) - pos, len(self.buf) - self.end)
+        self.buf[self.end:self.end+n] = chunk[pos:pos+n]
+        self.end += n
+        return n
+
+    #position dans self.buf de la prochaine trame complète, -1 si aucune
+    #(valable jusqu'au prochain readinto/write)
+    def next_frame(self):
+        buf = self.buf
+        end = self.end
+        i = self.start
+        while i <= end - 4 :
+            # en-têtes et terminateurs sont des suites décroissantes :
+            # f4 f3 f2 f1 ... f8 f7 f6 f5 (rapport), fd fc fb fa ... 04 03 02 01 (ACK)
+            h = buf[i]
+            if (h == 0xf4 or (h == 0xfd and self.acks)) and buf[i+1] == h-1 and buf[i+2] == h-2 and buf[i+3] == h-3 :
+                if end - i < 6 :
+                    break
+                total = (buf[i+4] | (buf[i+5] << 8)) + 10 #en-tête + longueur + données + terminateur
+                if total > self.max_len :
+                    i += 1 #longueur impossible : faux en-tête
+                    continue
+                if end - i < total :
+                    break
+                t = i + total
+                tail = 0xf8 if h == 0xf4 else 0x04
+                if buf[t-4] == tail and buf[t-3] == tail-1 and buf[t-2] == tail-2 and buf[t-1] == tail-3 :
+                    self.resync += i - self.start
+                    self.start = t
+                    self.frame_len = total
+                    self.frames += 1
+                    return i
+            i += 1
+        #pas de trame complète : on garde la fin (début possible d'une trame coupée)
+        self.resync += i - self.start
+        self.start = i
+        return -1
+
+    #ajoute un morceau de flux et rend (generateur) des copies des trames complètes
+    def feed(self, chunk):
+        pos = 0
+        while True :
+            if chunk :
+                pos += self.write(chunk, pos)
+            i = self.next_frame()
+            while i >= 0 :
+                yield bytes(self.mv[i:i+self.frame_len])
+                i = self.next_frame()
+            if not chunk or pos >= len(chunk) :
+                return
 
 
 class LD2410() :
     
-    def __init__(self,bus_uart): 
+    # port : clé du cache d'identité (par ex. "/dev/ttyUSB0" ou "UART1"),
+    #        par défaut l'attribut port du transport s'il existe
+    def __init__(self,bus_uart,port=None): 
         self.ser = bus_uart
+        self.port = port if port is not None else getattr(bus_uart, "port", None)
         
-        self.meas = {
-                "state": STATE_NO_TARGET,
-                "moving_distance": 0,
-                "moving_energy": 0,
-                "stationary_distance": 0,
-                "stationary_energy": 0,
-                "detection_distance": 0 }
+        self.meas = Measurement()
         
         self.communication_error = 0 
+        self.decoder = ReportDecoder(acks=True)
+        self.ack_timeout_ms = 100 #délai max d'attente d'un ACK
+        self.retries = 1          #nb de renvois si pas d'ACK
+        self.config = None        #cache SensorConfig, mis à jour par les commandes de configuration
+        self.stats_data = Stats()
+        self.recorder = None      #ld2410_record.FrameRecorder : enregistre les trames lues par read_reports
 
     #---------fonctions communes configuration ----------
     #affichage des trames - Utiliser pour debugger
@@ -63,39 +604,64 @@ class LD2410() :
         #return dummy
 
      #----------------Send command with ACK------------------------------------
+    # rend la trame ACK brute (NULLDATA si pas de réponse) - voir execute()
     def send_command(self, cmd_values):
-        cmd_data_len = bytes([len(cmd_values), 0x00]) #little endian
-        frame = HEADER + cmd_data_len + cmd_values + TERMINATOR
-        self.ser.write(frame)
-        #print(frame)#debug
-        #self.serial_flush() 
-        utime.sleep_ms(20)
-        #----------------reception  message----------------
-        if self.ser.any() > 0: 
-            #Lire le message reçu
-            response = self.ser.read()
-            #self.print_trames_bytes(response) # debug
-            if len(response) <10 :
-                response = NULLDATA
-            return response
-        else :
+        result = self.execute(cmd_values[0] | (cmd_values[1] << 8), cmd_values[2:])
+        if result.status == STATUS_TIMEOUT :
             print("probleme communication : reponse vide ")
-            response = NULLDATA
-            return response
+        return result.frame
+
+    # commande hors registre : cmd et valeur brute (octets après le mot de commande)
+    def execute(self, cmd, value=b'', timeout_ms=None, retries=None):
+        cmd_values = bytes([cmd & 0x00FF, (cmd & 0xFF00) >> 8]) + value
+        frame = HEADER + bytes([len(cmd_values), 0x00]) + cmd_values + TERMINATOR
+        return self._transact(cmd, frame, timeout_ms, retries)
+
+    # commande du registre COMMANDS : trame préconstruite remplie avec args,
+    # result.values = champs de l'ACK décodés
+    def call(self, name, *args, timeout_ms=None, retries=None):
+        command = COMMANDS[name]
+        result = self._transact(command.code, command.build(*args), timeout_ms, retries)
+        if result.ok :
+            result.values = command.decode(result.frame)
+        return result
+
+    # envoie la trame puis lit jusqu'à l'ACK dont le mot de commande vaut
+    # cmd | 0x0100 ou jusqu'à l'échéance ; les trames de rapport intercalées
+    # et les ACK d'autres commandes sont ignorés. Réessaie retries fois.
+    def _transact(self, cmd, frame, timeout_ms, retries):
+        if timeout_ms is None :
+            timeout_ms = self.ack_timeout_ms
+        if retries is None :
+            retries = self.retries
+        expected = cmd | 0x0100
+        decoder = self.decoder
+        buf = decoder.buf
+        for attempt in range(retries + 1):
+            decoder.reset() #octets restants d'une tentative précédente
+            self.ser.write(frame)
+            start = utime.ticks_ms()
+            while utime.ticks_diff(utime.ticks_ms(), start) < timeout_ms :
+                if self.ser.any() > 0 :
+                    self.stats_data.bytes_read += decoder.readinto(self.ser)
+                    i = decoder.next_frame()
+                    while i >= 0 :
+                        if buf[i] == 0xfd and (buf[i+6] | (buf[i+7] << 8)) == expected :
+                            response = bytes(decoder.mv[i:i+decoder.frame_len])
+                            result = CommandResult(cmd, response[8] | (response[9] << 8), response,
+                                                   attempt + 1, utime.ticks_diff(utime.ticks_ms(), start))
+                            self.stats_data.command(result)
+                            return result
+                        i = decoder.next_frame()
+                else :
+                    utime.sleep_ms(1)
+        result = CommandResult(cmd, STATUS_TIMEOUT, NULLDATA, retries + 1, timeout_ms)
+        self.stats_data.command(result)
+        return result
  
     #2.2.1 
     def enable_config(self):
-        cmd = 0x00FF
-        value = 0x0001
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_value = (value & 0xFF00) >> 8
-        octet2_value = value & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_value = bytes([octet2_cmd, octet1_cmd, octet2_value, octet1_value])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        if self.call("enable_config").ok :
             print('enable config success')
             return 1
         else :
@@ -104,14 +670,7 @@ class LD2410() :
         
     #2.2.2
     def end_config(self):
-        cmd = 0x00FE
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        if self.call("end_config").ok :
             print('end config success')
             return 1
         else :
@@ -121,58 +680,39 @@ class LD2410() :
      
     #2.2.3
     def Maximum_distance_gate_and_unoccupied_duration_parameters_configuration(self,maximum_mouvement_distance_door=8,maximum_resting_distance_door=8,no_one_duration=5):
-        cmd = 0x0060
-        param0 = 0x0000
-        param1 = 0x0001
-        param2 = 0x0002 
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_param0 = (param0 & 0xFF00) >> 8
-        octet2_param0 = param0 & 0x00FF
-        octet1_param1 = (param1 & 0xFF00) >> 8
-        octet2_param1 = param1 & 0x00FF
-        octet1_param2 = (param2 & 0xFF00) >> 8
-        octet2_param2 = param2 & 0x00FF
-        maximum_mouvement_distance_door = maximum_mouvement_distance_door.to_bytes(4,'little')
-        maximum_resting_distance_door = maximum_resting_distance_door.to_bytes(4,'little')
-        no_one_duration = no_one_duration.to_bytes(4,'little')
-        cmd_values = bytes([octet2_cmd, octet1_cmd,octet2_param0,octet1_param0])+maximum_mouvement_distance_door+bytes([octet2_param1,octet1_param1])+maximum_resting_distance_door+bytes([octet2_param2,octet1_param2])+no_one_duration
-        #cmd_values = cmd + param1 + maximum_mouvement_distance_door + param2+maximum_resting_distance_door + param3 + no_one_duration
-        response = self.send_command(cmd_values)
-        if response[7] and response[4] == 0x04 :
+        result = self.call("Maximum_distance_gate_and_unoccupied_duration_parameters_configuration",
+                           maximum_mouvement_distance_door, maximum_resting_distance_door, no_one_duration)
+        if result.ok :
             print('Maximum_distance_gate_and_unoccupied_duration_parameters_configuration success')
+            if self.config is not None :
+                self.config.max_moving_gate = maximum_mouvement_distance_door
+                self.config.max_stationary_gate = maximum_resting_distance_door
+                self.config.no_one_duration = no_one_duration
+                self._sync_identity()
             return 1
         else :
             print('Maximum_distance_gate_and_unoccupied_duration_parameters_configuration failure')
             return 0
         
-    #2.2.4 # A finir parser
-    def read_parameter(self):
-        cmd = 0x0061
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        self.print_trames_bytes(response)
-        if response[7] :
+    #2.2.4 rend la configuration décodée (SensorConfig) et la garde en cache
+    # refresh=False : rend le cache sans échange UART s'il est rempli
+    def read_parameter(self, refresh=False):
+        if self.config is not None and not refresh :
+            return self.config.copy()
+        config = decode_parameters(self.call("read_parameter").frame)
+        if config is not None :
             print('read parameter success')
-            return response
+            if self.config is not None :
+                config.resolution = self.config.resolution #non transmise par 2.2.4
+            self.config = config
+            self._sync_identity()
+            return config.copy()
         else :
             print('read parameter failure')
             return 0   
     #2.2.5    
     def enable_engineering_mode(self): 
-        cmd = 0x0062
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        if self.call("enable_engineering_mode").ok :
             print('enable engineering mode success')
             return 1
         else :
@@ -181,80 +721,44 @@ class LD2410() :
 
     #2.2.6
     def end_engineering_mode(self): #close project mode 
-        cmd = 0x0063
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
-            print('enable engineering mode success ')
+        if self.call("end_engineering_mode").ok :
+            print('end engineering mode success ')
             return 1
         else :
-            print('enable engineering mode failure')
+            print('end engineering mode failure')
             return 0
         
     #2.2.7
     def distance_gate_sensitivity_configuration(self,distance_gate=3,motion_sensitivity_value=40,standstill_sensitivity_value=40):
-        cmd = 0x0064
-        param0 = 0x0000
-        param1 = 0x0001 
-        param2 = 0x0002 
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_param0 = (param0 & 0xFF00) >> 8
-        octet2_param0 = param0 & 0x00FF
-        octet1_param1 = (param1 & 0xFF00) >> 8
-        octet2_param1 = param1 & 0x00FF
-        octet1_param2 = (param2 & 0xFF00) >> 8
-        octet2_param2 = param2 & 0x00FF
-        distance_gate = distance_gate.to_bytes(4,'little')
-        motion_sensitivity_value = motion_sensitivity_value.to_bytes(4,'little')
-        standstill_sensitivity_value = standstill_sensitivity_value.to_bytes(4,'little')
-        cmd_values = bytes([octet2_cmd, octet1_cmd,octet2_param0,octet1_param0])+distance_gate+bytes([octet2_param1,octet1_param1])+motion_sensitivity_value+bytes([octet2_param2,octet1_param2])+standstill_sensitivity_value
-        response = self.send_command(cmd_values)
-        if response[7] :
+        result = self.call("distance_gate_sensitivity_configuration",
+                           distance_gate, motion_sensitivity_value, standstill_sensitivity_value)
+        if result.ok :
             print('distance_gate_sensitivity_configuration success')
+            if self.config is not None :
+                gates = range(GATE_COUNT) if distance_gate == ALL_GATES else [distance_gate]
+                for gate in gates :
+                    self.config.motion_sensitivity[gate] = motion_sensitivity_value
+                    self.config.standstill_sensitivity[gate] = standstill_sensitivity_value
+                self._sync_identity()
             return 1
         else :
             print('distance_gate_sensitivity_configuration failure')
             return 0
           
-    #2.2.8
+    #2.2.8 rend la version 'Vmajeur.mineur.build'
     def read_firmware_version(self):
-        cmd = 0x00A0
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
-            response_12 = hex(response[12])[2:]
-            response_13 = hex(response[13])[2:]
-            response_14 = hex(response[14])[2:]
-            response_15 = hex(response[15])[2:]
-            response_16 = hex(response[16])[2:]
-            response_17 = hex(response[17])[2:]
-            print('firmware :V',response_13,'.',response_12,'.',response_17,response_16,response_15,response_14)
+        result = self.call("read_firmware_version")
+        if result.ok :
+            version = firmware_string(result.values)
+            print('firmware :' + version)
+            return version
         else :
             print('read firmware version failure')
             return 0
         
     #2.2.9
     def set_serial_port_baud_rate(self,baudrate=0x0007) : 
-        cmd = 0x00A1
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_baudrate = (baudrate & 0xFF00) >> 8
-        octet2_baudrate = baudrate & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_value = bytes([octet2_cmd, octet1_cmd, octet2_baudrate, octet1_baudrate])
-        response = self.send_command(cmd_value)
-        if response[7]  :
+        if self.call("set_serial_port_baud_rate", baudrate).ok :
             print('set_serial_port_baud_rate success, baudrate : ',f"0x{baudrate:04x}" )
             return 1
         else :
@@ -263,15 +767,10 @@ class LD2410() :
             
     #2.2.10
     def restore_factory_settings(self):
-        cmd = 0x00A2
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        IDENTITY_CACHE.pop(self.port, None) #même sans ACK la commande a pu passer
+        if self.call("restore_factory_settings").ok :
             print('restore_factory_settings success')
+            self.config = None
             return 1
         else :
             print('restore_factory_settings failure')
@@ -279,14 +778,8 @@ class LD2410() :
                
     #2.2.11
     def reboot_module(self): 
-        cmd = 0x00A3
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        IDENTITY_CACHE.pop(self.port, None)
+        if self.call("reboot_module").ok :
             print('reboot module success')
             return 1
         else :
@@ -295,16 +788,7 @@ class LD2410() :
                 
     #2.2.12
     def bluetooth_setting(self,on_off=0x0001) : 
-        cmd = 0x00A4
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_on_off = (on_off & 0xFF00) >> 8
-        octet2_on_off= on_off & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_value = bytes([octet2_cmd, octet1_cmd, octet2_on_off, octet1_on_off])
-        response = self.send_command(cmd_value)
-        if response[7] :
+        if self.call("bluetooth_setting", on_off).ok :
             print('bluetooth_setting, on(1)/OFF(0) : ', on_off)
             return 1
         else :
@@ -313,46 +797,18 @@ class LD2410() :
     
     #2.2.13
     def get_mac_address(self) : 
-        cmd = 0x00A5
-        value = 0x0001
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_value = (value & 0xFF00) >> 8
-        octet2_value= value & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_value = bytes([octet2_cmd, octet1_cmd, octet2_value, octet1_value])
-        response = self.send_command(cmd_value)
-        if response[7] :
-            response_10 = hex(response[10])[2:]
-            response_11 = hex(response[11])[2:]
-            response_12 = hex(response[12])[2:]
-            response_13 = hex(response[13])[2:]
-            response_14 = hex(response[14])[2:]
-            response_15 = hex(response[15])[2:]
-            print('MAc Address',response_10,response_11,response_12,response_13,response_14,response_15)
-            return response[10:16]
+        result = self.call("get_mac_address")
+        if result.ok :
+            mac = result.values["mac"]
+            print('MAc Address', ' '.join(['%02x' % b for b in mac]))
+            return mac
         else :
             print('get_mac_address failure')
             return 0
     
     #2.2.14
     def obtaining_bluetooth_permissions(self,password = 0x48694C696E6B4869): #Hilink
-        cmd = 0x00A8
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        # Convertir le password hexadécimal en une chaîne hexadécimale sans le préfixe '0x'
-        password_string = hex(password)[2:]
-        # Assurer que la longueur de la chaîne hexadécimale est un multiple de 2
-        if len(password_string) % 2 != 0:
-            password_string = '0' + password_string
-        # Séparer la chaîne hexadécimale en blocs de 2 caractères et convertir chaque bloc en entier hexadécimal
-        password_octets = [int(password_string[i:i+2], 16) for i in range(0, len(password_string), 2)]
-        cmd_values =bytes([octet2_cmd, octet1_cmd,password_octets[0],password_octets[1],password_octets[2],password_octets[3],password_octets[4],password_octets[5]])
-        print (cmd_values)
-        response = self.send_command(cmd_values)
-        if response[7] and response != NULLDATA :
+        if self.call("obtaining_bluetooth_permissions", password_bytes(password)).ok :
             print('obtaining_bluetooth_permissions success')
             return 1
         else :
@@ -362,26 +818,9 @@ class LD2410() :
 
     #2.2.15
     def set_bluetooth_password(self,password = 0x48694C696E6B): #Hilink
-        cmd = 0x00A9
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        # Convertir le password hexadécimal en une chaîne hexadécimale sans le préfixe '0x'
-        password_string = hex(password)[2:]
-        # Assurer que la longueur de la chaîne hexadécimale est un multiple de 2
-        if len(password_string) % 2 != 0:
-            password_string = '0' + password_string
-        # Séparer la chaîne hexadécimale en blocs de 2 caractères et convertir chaque bloc en entier hexadécimal
-        password_octets = [int(password_string[i:i+2], 16) for i in range(0, len(password_string), 2)]
-        cmd_values =bytes([octet2_cmd, octet1_cmd,password_octets[0],password_octets[1],password_octets[2],password_octets[3],password_octets[4],password_octets[5]])
-        print (cmd_values)
-        response = self.send_command(cmd_values)
-        #affichage
-        password_string = hex(password)[2:]  # [2:] pour supprimer le préfixe '0x'
-        password = bytes.fromhex(password_string)
-        password_text = password.decode()
-        if response[7] :
-            print('set_bluetooth_password success - password =',password_text)
+        password = password_bytes(password)
+        if self.call("set_bluetooth_password", password).ok :
+            print('set_bluetooth_password success - password =',password.decode())
             return 1
         else :
             print('set_bluetooth_password failure ')
@@ -389,19 +828,11 @@ class LD2410() :
     
     #2.2.16
     def distance_resolution_setting(self,distance=0x0000) : #0x0000 = 0.75    0x0001 = 0.2   
-        cmd = 0x00AA
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        octet1_distance = (distance & 0xFF00) >> 8
-        octet2_distance= distance & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_distance = bytes([octet2_cmd, octet1_cmd, octet2_distance, octet1_distance])
-        response = self.send_command(cmd_distance)
-        if response[7] and distance ==0x0000 and not response[8]  :
-            print('Distance_resolution_setting 0.75m success')
-        elif response[7] and response != NULLDATA and distance ==0x0001 and not response[8]:
-            print('Distance_resolution_setting 0.2m success')
+        if self.call("distance_resolution_setting", distance).ok and (distance == 0x0000 or distance == 0x0001) :
+            print('Distance_resolution_setting', '0.75m' if distance == 0x0000 else '0.2m', 'success')
+            if self.config is not None :
+                self.config.resolution = distance
+                self._sync_identity()
             return 1
         else :
             print('Distance_resolution_setting failure ')
@@ -409,24 +840,172 @@ class LD2410() :
     
     #2.2.17
     def query_distance_resolution_setting(self) :    
-        cmd = 0x00AB
-        value = None
-        #Extraire les octets individuels de chaque valeur -->pour faire little endian 
-        octet1_cmd = (cmd & 0xFF00) >> 8
-        octet2_cmd = cmd & 0x00FF
-        # Créer la séquence d'octets en ordre spécifié
-        cmd_value = bytes([octet2_cmd, octet1_cmd])
-        response = self.send_command(cmd_value)
-        if response[7] and response[10] and response[4] == 6 :
+        result = self.call("query_distance_resolution_setting")
+        if result.ok and result.values["resolution"] :
             print('Distance_resolution_setting 0.2m ')
+            if self.config is not None :
+                self.config.resolution = 0x0001
+                self._sync_identity()
             return 1
-        elif response[7] and response != NULLDATA and  not response[10] and response[4] == 6 :
+        elif result.ok :
             print('Distance_resolution_setting 0.75m')
+            if self.config is not None :
+                self.config.resolution = 0x0000
+                self._sync_identity()
             return 2
         else :
             print('query_distance_resolution_setting failure ')
             return 0
             
+    #---------configuration groupée ----------
+    #recopie le cache de configuration dans l'identité en cache du port
+    def _sync_identity(self):
+        identity = None if self.port is None else IDENTITY_CACHE.get(self.port)
+        if identity is not None :
+            identity.config = None if self.config is None else self.config.copy()
+
+    #lecture de la configuration complète (à appeler en mode configuration), mise en cache
+    def _read_config(self):
+        config = decode_parameters(self.call("read_parameter").frame)
+        if config is not None :
+            result = self.call("query_distance_resolution_setting")
+            config.resolution = result.values["resolution"] if result.ok else None
+            self.config = config
+            self._sync_identity()
+        return config
+
+    # identité du module (Identity) depuis IDENTITY_CACHE, sinon lue en une
+    # seule session de configuration et mise en cache ; 0 si échec
+    # sans port (UART brute, simulateur...) pas de cache : toujours lue
+    def identify(self, refresh=False):
+        identity = None if self.port is None else IDENTITY_CACHE.get(self.port)
+        if identity is not None and not refresh :
+            return identity
+        result = self.call("enable_config")
+        if not result.ok :
+            print('identify failure : enable config')
+            return 0
+        identity = Identity(self.port, protocol_version=result.values["protocol_version"],
+                            buffer_size=result.values["buffer_size"])
+        result = self.call("read_firmware_version")
+        if result.ok :
+            identity.firmware_type = result.values["firmware_type"]
+            identity.firmware = firmware_string(result.values)
+        result = self.call("get_mac_address")
+        if result.ok :
+            identity.mac = result.values["mac"]
+        config = self._read_config()
+        self.call("end_config")
+        if identity.firmware is None or identity.mac is None or config is None :
+            print('identify failure')
+            return 0
+        identity.config = config.copy()
+        if self.port is not None :
+            IDENTITY_CACHE[self.port] = identity
+        return identity
+
+    #relit la configuration du capteur (session complète) et la compare au cache
+    # rend 1 si le cache était à jour, 0 sinon ; le cache est remplacé par la lecture
+    def verify_config(self):
+        cached = self.config
+        if not self.call("enable_config").ok :
+            print('verify_config failure : enable config')
+            return 0
+        config = self._read_config()
+        self.call("end_config")
+        if config is None :
+            print('verify_config failure : read parameter')
+            self.config = None
+            self._sync_identity()
+            return 0
+        if cached is None or not cached == config :
+            print('verify_config : cache différent du capteur')
+            return 0
+        return 1
+
+    #commandes à envoyer pour passer de current à desired :
+    #liste de (nom de commande, arguments, [arguments pour revenir à current])
+    def _config_commands(self, current, desired):
+        commands = []
+        # 2.2.3 portes max et durée
+        gates = [desired.max_moving_gate, desired.max_stationary_gate, desired.no_one_duration]
+        before = [current.max_moving_gate, current.max_stationary_gate, current.no_one_duration]
+        for k in range(3):
+            if gates[k] is None :
+                gates[k] = before[k]
+        if gates != before :
+            commands.append(("Maximum_distance_gate_and_unoccupied_duration_parameters_configuration",
+                             gates, [before]))
+        # 2.2.7 sensibilités par porte
+        motion = desired.motion_sensitivity or current.motion_sensitivity
+        still = desired.standstill_sensitivity or current.standstill_sensitivity
+        changed = [g for g in range(GATE_COUNT)
+                   if motion[g] != current.motion_sensitivity[g] or still[g] != current.standstill_sensitivity[g]]
+        if len(changed) > 1 and motion.count(motion[0]) == GATE_COUNT and still.count(still[0]) == GATE_COUNT :
+            #même valeur pour toutes les portes : une seule commande
+            changed = [ALL_GATES]
+        for g in changed :
+            if g == ALL_GATES :
+                args = (g, motion[0], still[0])
+                undo_gates = range(GATE_COUNT)
+            else :
+                args = (g, motion[g], still[g])
+                undo_gates = [g]
+            undo = [(k, current.motion_sensitivity[k], current.standstill_sensitivity[k]) for k in undo_gates]
+            commands.append(("distance_gate_sensitivity_configuration", args, undo))
+        # 2.2.16 résolution (prise en compte au redémarrage du module)
+        if desired.resolution is not None and desired.resolution != current.resolution and current.resolution is not None :
+            commands.append(("distance_resolution_setting", (desired.resolution,), [(current.resolution,)]))
+        return commands
+
+    # applique desired en une seule session enable_config ... end_config :
+    # compare au cache (relu sur le capteur si vide ou refresh), n'envoie que les
+    # commandes qui changent quelque chose ; en cas d'échec les commandes déjà
+    # passées sont annulées si rollback.
+    # rend la liste des (nom, succès) des commandes envoyées, plus un
+    # ("rollback " + nom, False) par annulation en échec (cache alors vidé),
+    # 0 si échec de session
+    def apply_config(self, desired, rollback=True, refresh=False):
+        if not self.call("enable_config").ok :
+            print('apply_config failure : enable config')
+            return 0
+        current = self.config
+        if current is None or current.resolution is None or refresh :
+            current = self._read_config()
+        if current is None :
+            print('apply_config failure : read parameter')
+            self.call("end_config")
+            return 0
+        report = []
+        done = []
+        for name, args, undo in self._config_commands(current, desired):
+            ok = self.call(name, *args).ok
+            report.append((name, ok))
+            if not ok :
+                print(name, 'failure')
+                if rollback :
+                    undone = True
+                    for name, undo in reversed(done):
+                        for args in undo :
+                            if not self.call(name, *args).ok :
+                                #annulation impossible : le module n'est ni dans current ni dans desired
+                                report.append(("rollback " + name, False))
+                                undone = False
+                    print('apply_config : rollback', 'ok' if undone else 'failure')
+                    if not undone :
+                        self.config = None
+                break
+            done.append((name, undo))
+        if len(done) == len(report) :
+            self.config = current.merged(desired)
+        elif not rollback :
+            self.config = None #état partiel inconnu
+        self._sync_identity()
+        self.call("end_config")
+        sent = len([name for name, ok in report if not name.startswith("rollback ")])
+        print('apply_config :', len(done), '/', sent, 'commande(s) ok')
+        return report
+
     #2.3 RADAR data output
     #2.3.1  envoi d'une commande pour recevoir un rapport             
     def send_command_report_data(self) :
@@ -446,55 +1025,63 @@ class LD2410() :
         if self.ser.any() > 0: 
             #Lire le message reçu
             report_data = self.ser.read()
+            self.stats_data.bytes_read += len(report_data)
             #self.print_trames_bytes(report_data) # debug
             self.parse_report(report_data) #analyse mesure
             return report_data
         else :
             print("probleme communication : reponse vide ")
             report_data = NULLDATA
-            # sanity checks passed. Store the sensor data in meas
-            self.meas["state"] = 0
-            self.meas["moving_distance"] = 0
-            self.meas["moving_energy"] = 0
-            self.meas["stationary_distance"] = 0
-            self.meas["stationary_energy"] = 0
-            self.meas["detection_distance"] = 0
+            self.meas.clear()
             self.communication_error = 1 
             return report_data
         
-    def parse_report(self,data):
-        # sanity checks
-        if len(data) < 23:
-            print(f"error, frame length {data} is too short")
-            return 0
-        if data[0:4] != REPORT_HEADER:
-            print(f"error, frame header is incorrect")
-            return 0
-        # Check if data[4] (frame length) is valid. It must be 0x0d or 0x23
-        # depending on if we are in basic mode or engineering mode
-        if data[4] != 0x0d and data[4] != 0x23:
-            print(f"error, frame length is incorrect")
-            return 0
-        # data[7] must be report 'head' value 0xaa
-        if data[7] != 0xaa:
-            print(f"error, frame report head value is incorrect")
+    #2.3.2 lecture continue : décode toutes les trames arrivées depuis le dernier appel
+    # (le capteur émet sans commande, inutile d'écrire ni de vider le buffer)
+    # lecture par readinto dans le buffer fixe du décodeur, décodage sur place
+    def read_reports(self) :
+        count = 0
+        decoder = self.decoder
+        while self.ser.any() > 0:
+            self.stats_data.bytes_read += decoder.readinto(self.ser)
+            i = decoder.next_frame()
+            while i >= 0 :
+                if self.recorder is not None :
+                    self.recorder.record(decoder.mv, i, decoder.frame_len)
+                if decoder.buf[i] != 0xfd : #ACK tardif d'une commande : ignoré
+                    count += self.parse_report(decoder.buf, i)
+                i = decoder.next_frame()
+        return count
+
+    # data : trame seule, ou buffer contenant la trame à partir de offset
+    def parse_report(self,data,offset=0):
+        error = decode_report(self.meas, data, offset)
+        if error :
+            print("error,", error)
+            self.stats_data.reject(error)
             return 0
-        # sanity checks passed. Store the sensor data in meas
-        self.meas["state"] = data[8]
-        self.meas["moving_distance"] = data[9] + (data[10] << 8)
-        self.meas["moving_energy"] = data[11]
-        self.meas["stationary_distance"] = data[12] + (data[13] << 8)
-        self.meas["stationary_energy"] = data[14]
-        self.meas["detection_distance"] = data[15] + (data[16] << 8)
+        self.stats_data.frame(self.meas)
+        self.communication_error = 0 #le module répond à nouveau
         return 1
+
+    # instantané des compteurs : trames décodées / rejetées par raison, octets lus,
+    # octets ignorés (resynchronisation), latence des commandes par code, âge de la mesure
+    def stats(self):
+        snapshot = self.stats_data.snapshot(self.decoder.resync)
+        snapshot["communication_error"] = self.communication_error
+        return snapshot
           
     def print_meas(self):
-        print(f"state: {TARGET_NAME[self.meas['state']]}")
-        print(f"moving distance: {self.meas['moving_distance']}")
-        print(f"moving energy: {self.meas['moving_energy']}")
-        print(f"stationary distance: {self.meas['stationary_distance']}")
-        print(f"stationary energy: {self.meas['stationary_energy']}")
-        print(f"detection distance: {self.meas['detection_distance']}")
+        print(f"state: {TARGET_NAME[self.meas.state]}")
+        print(f"moving distance: {self.meas.moving_distance}")
+        print(f"moving energy: {self.meas.moving_energy}")
+        print(f"stationary distance: {self.meas.stationary_distance}")
+        print(f"stationary energy: {self.meas.stationary_energy}")
+        print(f"detection distance: {self.meas.detection_distance}")
+        if self.meas.engineering :
+            print(f"moving gate energy: {list(self.meas.moving_gate_energy)}")
+            print(f"stationary gate energy: {list(self.meas.stationary_gate_energy)}")
+            print(f"light: {self.meas.light} out pin: {self.meas.out_pin}")
         
 
     def human_detection(self,led,seuil_stat,seuil_mov):
@@ -504,11 +1091,11 @@ class LD2410() :
                 utime.sleep(0.1)
                 led.off()
                 utime.sleep(0.1)
-        elif self.meas['stationary_energy']>seuil_stat or self.meas['moving_energy']>seuil_mov :
-            if self.meas['stationary_distance']<self.meas['moving_distance'] :
-                print('presence humaine immobile  à ',self.meas['stationary_distance'],'cm')
+        elif self.meas.stationary_energy>seuil_stat or self.meas.moving_energy>seuil_mov :
+            if self.meas.stationary_distance<self.meas.moving_distance :
+                print('presence humaine immobile  à ',self.meas.stationary_distance,'cm')
             else :
-                print('presence humaine en mouvement à ',self.meas['moving_distance'],'cm')
+                print('presence humaine en mouvement à ',self.meas.moving_distance,'cm')
             led.on()
             return 1
         else :     
@@ -0,0 +1,247 @@
+# HLK-LD2410 B et C  - pilote non bloquant (asyncio CPython / uasyncio MicroPython)
+# Les commandes attendent leur trame ACK avec un timeout au lieu de dormir,
+# une tâche de fond lit l'UART en continu et alimente un itérateur asynchrone
+# de mesures :
+#
+#   sensor = AsyncLD2410(reader, writer)   # MicroPython : reader = writer = asyncio.StreamWriter(uart)
+#   sensor.start()
+#   await sensor.enable_config()
+#   ...
+#   async for meas in sensor :
+#       print(meas.state, meas.moving_distance)
+try :
+    import asyncio
+except ImportError :
+    import uasyncio as asyncio
+
+import ld2410
+from ld2410 import HEADER, TERMINATOR, NULLDATA
+
+
+class AsyncLD2410() :
+
+    def __init__(self, reader, writer, ack_timeout_ms=500, chunk_size=64):
+        self.reader = reader
+        self.writer = writer
+        self.ack_timeout_ms = ack_timeout_ms
+        self.chunk_size = chunk_size
+        self.decoder = ld2410.ReportDecoder(acks=True)
+        self.meas = ld2410.Measurement()
+        self.stats_data = ld2410.Stats()
+        self.communication_error = 0
+        self.running = False
+        self._task = None
+        self._lock = asyncio.Lock()      #une seule commande en cours
+        self._ack_event = asyncio.Event()
+        self._ack_cmd = None             #mot de commande ACK attendu (cmd | 0x0100)
+        self._ack = NULLDATA
+        self._meas_event = asyncio.Event()
+
+    #---------tâche de lecture ----------
+    def start(self):
+        if self._task is None :
+            self.running = True
+            self._task = asyncio.create_task(self._reader_loop())
+        return self._task
+
+    def stop(self):
+        self.running = False
+        if self._task is not None :
+            self._task.cancel()
+            self._task = None
+        self._meas_event.set() #débloque les itérateurs en attente
+
+    async def _reader_loop(self):
+        try :
+            while self.running :
+                chunk = await self.reader.read(self.chunk_size)
+                if not chunk : #fin de flux
+                    print("probleme communication : fin du flux UART")
+                    self.communication_error = 1
+                    break
+                self.stats_data.bytes_read += len(chunk)
+                for frame in self.decoder.feed(chunk):
+                    self._dispatch(frame)
+        finally :
+            self.running = False
+            self._meas_event.set()
+
+    def _dispatch(self, frame):
+        if frame[0] == 0xfd : #ACK de commande
+            if self._ack_cmd is not None and (frame[6] | (frame[7] << 8)) == self._ack_cmd :
+                self._ack = frame
+                self._ack_cmd = None
+                self._ack_event.set()
+        else :
+            error = ld2410.decode_report(self.meas, frame)
+            if error :
+                self.stats_data.reject(error)
+                return
+            self.stats_data.frame(self.meas)
+            self.communication_error = 0
+            self._meas_event.set()
+
+    #mêmes compteurs que LD2410.stats()
+    def stats(self):
+        snapshot = self.stats_data.snapshot(self.decoder.resync)
+        snapshot["communication_error"] = self.communication_error
+        return snapshot
+
+    #---------itérateur de mesures ----------
+    # rend self.meas (mis à jour sur place) à chaque nouvelle trame,
+    # les trames arrivées pendant le traitement du consommateur sont fusionnées
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self._meas_event.wait()
+        self._meas_event.clear()
+        if not self.running :
+            raise StopAsyncIteration
+        return self.meas
+
+    #----------------Send command with ACK------------------------------------
+    async def send_command(self, cmd_values, timeout_ms=None):
+        cmd_data_len = bytes([len(cmd_values), 0x00]) #little endian
+        frame = HEADER + cmd_data_len + cmd_values + TERMINATOR
+        result = await self._transact(cmd_values[0] | (cmd_values[1] << 8), frame, timeout_ms)
+        return result.frame
+
+    async def command(self, cmd, value=b''):
+        return await self.send_command(bytes([cmd & 0x00FF, (cmd & 0xFF00) >> 8]) + value)
+
+    # commande du registre ld2410.COMMANDS, rend un CommandResult (values décodées)
+    async def call(self, name, *args, timeout_ms=None):
+        command = ld2410.COMMANDS[name]
+        async with self._lock :
+            #copie : la trame préconstruite du registre est partagée
+            result = await self._transact(command.code, bytes(command.build(*args)), timeout_ms, locked=True)
+        if result.ok :
+            result.values = command.decode(result.frame)
+        return result
+
+    async def _transact(self, cmd, frame, timeout_ms, locked=False):
+        if not locked :
+            async with self._lock :
+                return await self._transact(cmd, frame, timeout_ms, True)
+        if timeout_ms is None :
+            timeout_ms = self.ack_timeout_ms
+        self._ack = NULLDATA
+        self._ack_event.clear()
+        self._ack_cmd = cmd | 0x0100
+        start = ld2410.utime.ticks_ms()
+        self.writer.write(frame)
+        await self.writer.drain()
+        try :
+            await asyncio.wait_for(self._ack_event.wait(), timeout_ms / 1000)
+        except asyncio.TimeoutError :
+            print("probleme communication : pas d'ACK")
+            self._ack_cmd = None
+        response = self._ack
+        status = ld2410.STATUS_TIMEOUT if response == NULLDATA else response[8] | (response[9] << 8)
+        result = ld2410.CommandResult(cmd, status, response, 1,
+                                      ld2410.utime.ticks_diff(ld2410.utime.ticks_ms(), start))
+        self.stats_data.command(result)
+        return result
+
+    async def _simple(self, name, *args):
+        if (await self.call(name, *args)).ok :
+            print(name, 'success')
+            return 1
+        print(name, 'failure')
+        return 0
+
+    #2.2.1
+    async def enable_config(self):
+        return await self._simple('enable_config')
+
+    #2.2.2
+    async def end_config(self):
+        return await self._simple('end_config')
+
+    #2.2.3
+    async def Maximum_distance_gate_and_unoccupied_duration_parameters_configuration(self,maximum_mouvement_distance_door=8,maximum_resting_distance_door=8,no_one_duration=5):
+        return await self._simple('Maximum_distance_gate_and_unoccupied_duration_parameters_configuration',
+                                  maximum_mouvement_distance_door, maximum_resting_distance_door, no_one_duration)
+
+    #2.2.4 rend la configuration décodée (SensorConfig), 0 si échec
+    async def read_parameter(self):
+        config = ld2410.decode_parameters((await self.call('read_parameter')).frame)
+        if config is not None :
+            return config
+        print('read parameter failure')
+        return 0
+
+    #2.2.5
+    async def enable_engineering_mode(self):
+        return await self._simple('enable_engineering_mode')
+
+    #2.2.6
+    async def end_engineering_mode(self):
+        return await self._simple('end_engineering_mode')
+
+    #2.2.7
+    async def distance_gate_sensitivity_configuration(self,distance_gate=3,motion_sensitivity_value=40,standstill_sensitivity_value=40):
+        return await self._simple('distance_gate_sensitivity_configuration',
+                                  distance_gate, motion_sensitivity_value, standstill_sensitivity_value)
+
+    #2.2.8 rend la version 'Vmajeur.mineur.build', 0 si échec
+    async def read_firmware_version(self):
+        result = await self.call('read_firmware_version')
+        if result.ok :
+            return ld2410.firmware_string(result.values)
+        print('read firmware version failure')
+        return 0
+
+    #2.2.9
+    async def set_serial_port_baud_rate(self,baudrate=0x0007):
+        return await self._simple('set_serial_port_baud_rate', baudrate)
+
+    #2.2.10
+    async def restore_factory_settings(self):
+        return await self._simple('restore_factory_settings')
+
+    #2.2.11
+    async def reboot_module(self):
+        return await self._simple('reboot_module')
+
+    #2.2.12
+    async def bluetooth_setting(self,on_off=0x0001):
+        return await self._simple('bluetooth_setting', on_off)
+
+    #2.2.13
+    async def get_mac_address(self):
+        result = await self.call('get_mac_address')
+        if result.ok :
+            return result.values["mac"]
+        print('get_mac_address failure')
+        return 0
+
+    #2.2.16
+    async def distance_resolution_setting(self,distance=0x0000): #0x0000 = 0.75    0x0001 = 0.2
+        return await self._simple('distance_resolution_setting', distance)
+
+    #2.2.17 1 = 0.2m, 2 = 0.75m, 0 = échec (mêmes valeurs que LD2410)
+    async def query_distance_resolution_setting(self):
+        result = await self.call('query_distance_resolution_setting')
+        if result.ok :
+            return 1 if result.values["resolution"] else 2
+        print('query_distance_resolution_setting failure ')
+        return 0
+
+    #détection : le clignotement d'erreur ne bloque plus la boucle
+    async def human_detection(self,led,seuil_stat,seuil_mov):
+        meas = self.meas
+        if self.communication_error :
+            for i in range (10) :
+                led.on()
+                await asyncio.sleep(0.1)
+                led.off()
+                await asyncio.sleep(0.1)
+            return 0
+        elif meas.stationary_energy>seuil_stat or meas.moving_energy>seuil_mov :
+            led.on()
+            return 1
+        else :
+            led.off()
+            return 0
@@ -0,0 +1,136 @@
+# HLK-LD2410 B et C  - détection et négociation de la vitesse UART
+# probe_baudrate essaie les vitesses candidates côté hôte (set_baudrate du
+# transport) jusqu'à recevoir l'ACK de enable_config : la vitesse du module
+# n'a plus besoin d'être connue d'avance.
+# negotiate_baudrate passe le module (2.2.9 + 2.2.11) de la vitesse la plus
+# haute à la plus basse et garde la première qui transmet test_frames trames
+# sans erreur (câbles longs : vitesse basse, latence : vitesse haute).
+# Le module garde sa vitesse après coupure ; path (facultatif) garde aussi la
+# vitesse trouvée côté hôte pour l'essayer en premier au démarrage suivant.
+#
+#   human_sensor = ld2410.LD2410(UARTTransport(UART(1, tx=Pin(4), rx=Pin(5), timeout=1)))
+#   probe_baudrate(human_sensor, path="ld2410.baud")
+#   negotiate_baudrate(human_sensor, path="ld2410.baud")
+from ld2410 import utime, BAUDRATES
+
+#vitesse -> index de la commande 2.2.9
+BAUDRATE_INDEX = {}
+for index, rate in BAUDRATES.items() :
+    BAUDRATE_INDEX[rate] = index
+
+#ordre d'essai par défaut : vitesse usine, puis de la plus haute à la plus basse
+DEFAULT_CANDIDATES = [256000] + sorted([rate for rate in BAUDRATES.values() if rate != 256000], reverse=True)
+
+
+def load_baudrate(path):
+    try :
+        with open(path) as f :
+            return int(f.read())
+    except (OSError, ValueError) :
+        return 0
+
+
+def save_baudrate(path, baudrate):
+    with open(path, 'w') as f :
+        f.write(str(baudrate))
+
+
+#change la vitesse côté hôte et vide ce qui a été reçu à l'ancienne vitesse
+def _set_host_baudrate(sensor, baudrate):
+    sensor.ser.set_baudrate(baudrate)
+    sensor.decoder.reset()
+    if sensor.ser.any() > 0 :
+        sensor.serial_flush()
+
+
+#le module répond-il à enable_config à la vitesse courante de l'hôte ?
+def _answers(sensor, timeout_ms):
+    if not sensor.call("enable_config", timeout_ms=timeout_ms).ok :
+        return 0
+    sensor.call("end_config", timeout_ms=timeout_ms)
+    return 1
+
+
+# rend la vitesse du module (et y laisse l'hôte), 0 si aucune candidate ne répond
+def probe_baudrate(sensor, candidates=None, timeout_ms=200, path=None):
+    if candidates is None :
+        candidates = DEFAULT_CANDIDATES
+    candidates = list(candidates)
+    if path is not None :
+        saved = load_baudrate(path)
+        if saved in candidates :
+            candidates.remove(saved)
+            candidates.insert(0, saved)
+    for baudrate in candidates :
+        _set_host_baudrate(sensor, baudrate)
+        if _answers(sensor, timeout_ms) :
+            print('probe_baudrate success :', baudrate)
+            sensor.communication_error = 0
+            if path is not None :
+                save_baudrate(path, baudrate)
+            return baudrate
+    print('probe_baudrate failure')
+    sensor.communication_error = 1
+    return 0
+
+
+# passe le module et l'hôte à baudrate (2.2.9 puis redémarrage 2.2.11),
+# rend 1 si le module répond à la nouvelle vitesse
+def switch_baudrate(sensor, baudrate, boot_ms=1000, timeout_ms=200):
+    if baudrate not in BAUDRATE_INDEX :
+        print('switch_baudrate failure : unknown baudrate', baudrate)
+        return 0
+    if not (sensor.enable_config() and sensor.set_serial_port_baud_rate(BAUDRATE_INDEX[baudrate])) :
+        sensor.end_config()
+        return 0
+    sensor.reboot_module() #l'ACK arrive encore à l'ancienne vitesse
+    _set_host_baudrate(sensor, baudrate)
+    utime.sleep_ms(boot_ms)
+    _set_host_baudrate(sensor, baudrate) #octets émis pendant le démarrage
+    return _answers(sensor, timeout_ms)
+
+
+# nb d'erreurs (trames rejetées + octets ignorés) sur test_frames trames,
+# -1 si elles n'arrivent pas avant timeout_ms
+def link_errors(sensor, test_frames=20, timeout_ms=5000):
+    rejected = sum(sensor.stats_data.rejected.values())
+    resync = sensor.decoder.resync
+    frames = 0
+    start = utime.ticks_ms()
+    while frames < test_frames :
+        if utime.ticks_diff(utime.ticks_ms(), start) > timeout_ms :
+            return -1
+        count = sensor.read_reports()
+        if not count :
+            utime.sleep_ms(5)
+        frames += count
+    return sum(sensor.stats_data.rejected.values()) - rejected + sensor.decoder.resync - resync
+
+
+# cherche la vitesse la plus haute tenue par la liaison (max_errors erreurs
+# au plus sur test_frames trames) ; rend la vitesse retenue, 0 si échec
+def negotiate_baudrate(sensor, candidates=None, test_frames=20, max_errors=0, boot_ms=1000, timeout_ms=200, path=None):
+    current = probe_baudrate(sensor, timeout_ms=timeout_ms, path=path)
+    if not current :
+        return 0
+    if candidates is None :
+        candidates = BAUDRATES.values()
+    for baudrate in sorted(candidates, reverse=True) :
+        if baudrate != current :
+            if not switch_baudrate(sensor, baudrate, boot_ms, timeout_ms) :
+                #module inaccessible à cette vitesse : le retrouver avant de descendre
+                current = probe_baudrate(sensor, timeout_ms=timeout_ms)
+                if not current :
+                    return 0
+                continue
+            current = baudrate
+        errors = link_errors(sensor, test_frames)
+        print('negotiate_baudrate :', baudrate, 'erreurs', errors)
+        if 0 <= errors <= max_errors :
+            print('negotiate_baudrate success :', baudrate)
+            sensor.communication_error = 0
+            if path is not None :
+                save_baudrate(path, baudrate)
+            return baudrate
+    print('negotiate_baudrate failure')
+    return 0
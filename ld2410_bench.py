@@ -0,0 +1,626 @@
+# HLK-LD2410 B et C  - mesures de performance des chemins critiques (sans matériel)
+# Même script sur PC et sur MicroPython (port unix) ; l'UART est remplacée par
+# FakeUART qui rejoue des trames préparées et répond aux commandes.
+#
+#   python3 ld2410_bench.py                         # tous les cas
+#   python3 ld2410_bench.py --quick                 # moins d'itérations
+#   python3 ld2410_bench.py --save bench.json       # garde les résultats
+#   python3 ld2410_bench.py --compare bench.json    # compare (code retour 1 si régression)
+#   micropython ld2410_bench.py --save bench_mp.json
+#
+# Pour chaque cas : opérations par seconde, µs par opération et, pour le
+# chemin des rapports, allocations comparées au parse_report d'origine (cas
+# *_legacy) : octets par trame (gc.mem_alloc) sur MicroPython, pic d'octets
+# temporaires de chaque trame (tracemalloc) sur CPython.
+# Latence des commandes : module simulé répondant après 0 à 60 ms, moteur
+# de commandes (attente de l'ACK) contre l'attente fixe de 20 ms d'origine.
+# Passerelle (CPython) : SensorManager avec 1 à 64 capteurs simulés, trames/s
+# du flux fusionné et durée de la configuration en parallèle.
+# Chaque cas est répété au moins 200 ms (20 ms avec --quick), 3 fois (5 pour
+# le chemin des rapports), le meilleur débit est gardé. Seul le chemin des
+# rapports (REPORT_PATH) est comparé au résultat enregistré : une régression
+# = débit inférieur de plus de --tolerance (30 % par défaut), ou plus de
+# ALLOC_TOLERANCE octets alloués en plus par trame.
+import gc
+import json
+import sys
+
+import ld2410
+from ld2410 import utime
+from ld2410_frames import build_ack, build_report, capture_stream
+
+try :
+    from time import perf_counter_ns
+
+    def now_us():
+        return perf_counter_ns() // 1000
+
+    def diff_us(end, start):
+        return end - start
+except ImportError :
+    import utime
+
+    def now_us():
+        return utime.ticks_us()
+
+    def diff_us(end, start):
+        return utime.ticks_diff(end, start)
+
+if hasattr(gc, "mem_alloc") :
+    ALLOC_UNIT = "bytes"
+
+    #octets alloués par trame (op traite une trame), GC arrêté
+    def allocations(op, n):
+        gc.collect()
+        gc.disable()
+        start = gc.mem_alloc()
+        for i in range(n):
+            op()
+        end = gc.mem_alloc()
+        gc.enable()
+        return (end - start) / n
+else :
+    import tracemalloc
+    ALLOC_UNIT = "peak bytes"
+
+    #CPython libère chaque objet dès qu'il n'est plus référencé et ne compte
+    #pas les allocations : pic d'octets temporaires (tracemalloc) de chaque
+    #trame, moyenné sur les n trames
+    def allocations(op, n):
+        gc.collect()
+        tracemalloc.start()
+        total = 0
+        for i in range(n):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op()
+            total += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+        return total / n
+
+BASIC_FRAME = build_report(3, 80, 60, 120, 40, 150)
+ENGINEERING_FRAME = build_report(3, 80, 60, 120, 40, 150, [60, 40, 20, 10, 5, 5, 5, 5, 5],
+                                 [0, 40, 30, 10, 5, 5, 5, 5, 5], 0, 1)
+
+
+#----------- UART simulée ------------
+# rend stream en boucle par morceaux de chunk octets ; une commande écrite
+# ajoute son ACK (statut 0) devant le flux, ack_delay_ms après l'écriture
+class FakeUART() :
+
+    def __init__(self, stream=b'', chunk=64, ack_delay_ms=0):
+        self.stream = stream
+        self.chunk = chunk
+        self.ack_delay_ms = ack_delay_ms
+        self._ack_at = 0
+        self.pos = 0
+        self.available = 0   #octets à rendre avant que any() retombe à 0 (un « poll »)
+        self.answer = 0      #octets rendus disponibles après une commande de rapport (2.3.1)
+        self.pending = 0
+        self.ack = b''
+        self.payloads = {0x0061: bytes([0xaa, 8, 8, 8]) + bytes(18) + bytes([5, 0]),
+                         0x00A0: bytes([0, 0, 2, 1, 0x16, 0x24, 0x06, 0x22]),
+                         0x00A5: bytes(6), 0x00AB: bytes(2), 0x00FF: bytes([1, 0, 0x40, 0])}
+
+    def refill(self, n):
+        self.available = n
+
+    #ACK pas encore émis par le module
+    def _ack_waiting(self):
+        return self.ack_delay_ms and utime.ticks_diff(utime.ticks_ms(), self._ack_at) < 0
+
+    #les octets d'une réponse de rapport arrivent après la vidange qui suit l'envoi
+    def any(self):
+        if self.pending :
+            self.available += self.pending
+            self.pending = 0
+        if self._ack_waiting() :
+            return self.available
+        return len(self.ack) + self.available
+
+    def read(self):
+        ack = b'' if self._ack_waiting() else self.ack
+        if not ack and not self.available :
+            return None
+        data = ack + self._take(self.available)
+        if ack :
+            self.ack = b''
+        return data
+
+    def _take(self, n):
+        out = b''
+        while n :
+            k = min(n, len(self.stream) - self.pos)
+            out += self.stream[self.pos:self.pos+k]
+            self.pos = (self.pos + k) % len(self.stream)
+            self.available -= k
+            n -= k
+        return out
+
+    def readinto(self, buf):
+        if self.ack and not self._ack_waiting() :
+            n = min(len(buf), len(self.ack))
+            buf[:n] = self.ack[:n]
+            self.ack = self.ack[n:]
+            return n
+        n = min(len(buf), self.available, self.chunk, len(self.stream) - self.pos)
+        if n <= 0 :
+            return None
+        buf[:n] = self.stream[self.pos:self.pos+n]
+        self.pos = (self.pos + n) % len(self.stream)
+        self.available -= n
+        return n
+
+    def write(self, data):
+        if data[0] == 0xfd :
+            cmd = data[6] | (data[7] << 8)
+            self.ack = build_ack(cmd, 0, self.payloads.get(cmd, b''))
+            self._ack_at = utime.ticks_add(utime.ticks_ms(), self.ack_delay_ms)
+        else :
+            self.pending = self.answer
+        return len(data)
+
+    def set_baudrate(self, baudrate):
+        pass
+
+
+#----------- cas mesurés ------------
+# chaque cas : fonction(n) qui exécute n opérations
+
+def case_parse_report(frame):
+    sensor = ld2410.LD2410(FakeUART())
+    def run(n):
+        parse = sensor.parse_report
+        for i in range(n):
+            parse(frame)
+    return run
+
+
+#parse_report d'origine (avant ReportDecoder) : référence pour les allocations
+#(tranche data[0:4] pour l'en-tête, mesure dans un dict)
+class LegacyParser() :
+
+    def __init__(self):
+        self.meas = {"state": 0, "moving_distance": 0, "moving_energy": 0,
+                     "stationary_distance": 0, "stationary_energy": 0, "detection_distance": 0}
+
+    def parse_report(self, data):
+        if len(data) < 23:
+            print(f"error, frame length {data} is too short")
+            return 0
+        if data[0:4] != ld2410.REPORT_HEADER:
+            print(f"error, frame header is incorrect")
+            return 0
+        if data[4] != 0x0d and data[4] != 0x23:
+            print(f"error, frame length is incorrect")
+            return 0
+        if data[7] != 0xaa:
+            print(f"error, frame report head value is incorrect")
+            return 0
+        self.meas["state"] = data[8]
+        self.meas["moving_distance"] = data[9] + (data[10] << 8)
+        self.meas["moving_energy"] = data[11]
+        self.meas["stationary_distance"] = data[12] + (data[13] << 8)
+        self.meas["stationary_energy"] = data[14]
+        self.meas["detection_distance"] = data[15] + (data[16] << 8)
+        return 1
+
+
+def case_legacy_parse_report(frame):
+    parser = LegacyParser()
+    def run(n):
+        parse = parser.parse_report
+        for i in range(n):
+            parse(frame)
+    return run
+
+
+#lecture d'origine : une trame rendue par ser.read() puis parse_report
+def case_legacy_read():
+    uart = FakeUART(BASIC_FRAME)
+    parser = LegacyParser()
+    size = len(BASIC_FRAME)
+    def run(n):
+        for i in range(n):
+            uart.refill(size)
+            parser.parse_report(uart.read())
+    return run
+
+
+#read_reports sur un flux de trames basic : une opération = une trame
+def case_read_reports(frames_per_poll=16):
+    uart = FakeUART(BASIC_FRAME * frames_per_poll, chunk=256)
+    sensor = ld2410.LD2410(uart)
+    size = len(BASIC_FRAME) * frames_per_poll
+    def run(n):
+        for i in range(n // frames_per_poll):
+            uart.refill(size)
+            sensor.read_reports()
+    return run
+
+
+#décodeur seul sur le flux rejouable capture_stream, découpé en morceaux de
+#1 à 64 octets comme des lectures UART : une opération = une trame (trames/s)
+def case_decoder_stream():
+    data, reports = capture_stream()
+    chunks = []
+    pos = 0
+    k = 0
+    while pos < len(data) :
+        size = (k * 13) % 64 + 1
+        chunks.append(data[pos:pos+size])
+        pos += size
+        k += 1
+    decoder = ld2410.ReportDecoder()
+    def run(n):
+        for i in range(n // len(reports)):
+            for chunk in chunks :
+                for frame in decoder.feed(chunk):
+                    pass
+    return run
+
+
+def _default_args(command):
+    return [b'HiLink' if fmt == "<6s" else 1 for fmt, offset in command.slots]
+
+
+def case_build(name):
+    command = ld2410.COMMANDS[name]
+    args = _default_args(command)
+    def run(n):
+        build = command.build
+        for i in range(n):
+            build(*args)
+    return run
+
+
+#construction à l'ancienne (concaténation) : référence pour les trames précalculées
+def case_build_concat():
+    def run(n):
+        for i in range(n):
+            cmd_values = bytes([0x64, 0x00]) + ld2410.COMMANDS["distance_gate_sensitivity_configuration"].frame[8:26]
+            ld2410.HEADER + bytes([len(cmd_values), 0x00]) + cmd_values + ld2410.TERMINATOR
+    return run
+
+
+#aller-retour commande / ACK par le moteur de commandes (UART simulée instantanée)
+def case_call(name):
+    sensor = ld2410.LD2410(FakeUART(BASIC_FRAME))
+    args = _default_args(ld2410.COMMANDS[name])
+    def run(n):
+        for i in range(n):
+            sensor.call(name, *args)
+    return run
+
+
+#2.3.1 send_command_report_data : écriture, attente de 100 ms du pilote, lecture
+def case_poll_latency():
+    uart = FakeUART(BASIC_FRAME)
+    uart.answer = len(BASIC_FRAME)
+    sensor = ld2410.LD2410(uart)
+    def run(n):
+        for i in range(n):
+            sensor.send_command_report_data()
+    return run
+
+
+def case_detector():
+    from ld2410_detect import PresenceDetector
+    sensor = ld2410.LD2410(FakeUART())
+    sensor.parse_report(BASIC_FRAME)
+    detector = PresenceDetector()
+    def run(n):
+        meas = sensor.meas
+        for i in range(n):
+            detector.update(meas, i * 100)
+    return run
+
+
+def case_tracker():
+    from ld2410_track import AlphaBetaTracker
+    sensor = ld2410.LD2410(FakeUART())
+    sensor.parse_report(BASIC_FRAME)
+    tracker = AlphaBetaTracker()
+    def run(n):
+        meas = sensor.meas
+        for i in range(n):
+            tracker.update(meas, i * 100)
+    return run
+
+
+#publication : offer + lot JSON delta + envoi vers un puits en mémoire
+def case_publish():
+    from ld2410_publish import Publisher, MessageQueue, asyncio
+    class NullSink() :
+        async def send(self, payload):
+            pass
+    sensor = ld2410.LD2410(FakeUART())
+    sensor.parse_report(BASIC_FRAME)
+    def run(n):
+        publisher = Publisher(NullSink(), MessageQueue(n), batch_size=50)
+        meas = sensor.meas
+        for i in range(n):
+            meas.moving_distance = i & 0xFF
+            publisher.offer("bench", meas, i)
+        asyncio.run(publisher.flush())
+    return run
+
+
+#décodage NumPy en masse (CPython avec NumPy seulement)
+def case_numpy():
+    import ld2410_numpy
+    data = BASIC_FRAME * 10000
+    def run(n):
+        for i in range(n // 10000):
+            ld2410_numpy.decode_frames(data)
+    return run
+
+
+#cas du chemin des rapports : seuls comparés au résultat enregistré (les
+#autres, plus courts ou dépendants de l'ordonnanceur, sont affichés pour info)
+REPORT_PATH = ("parse_report_basic", "parse_report_engineering", "read_reports_per_frame",
+               "decoder_stream_per_frame")
+#allocation supplémentaire tolérée (octets par trame) : moins qu'un objet
+ALLOC_TOLERANCE = 8
+
+
+# (nom, fonction, nb d'opérations par appel)
+def cases():
+    out = [("parse_report_basic", case_parse_report(BASIC_FRAME), 1000),
+           ("parse_report_engineering", case_parse_report(ENGINEERING_FRAME), 1000),
+           ("parse_report_legacy", case_legacy_parse_report(BASIC_FRAME), 1000),
+           ("read_reports_per_frame", case_read_reports(), 1024),
+           ("read_legacy_per_frame", case_legacy_read(), 1000),
+           ("decoder_stream_per_frame", case_decoder_stream(), 100),
+           ("build_concat", case_build_concat(), 1000)]
+    for name in ld2410.COMMANDS :
+        out.append(("build_" + name, case_build(name), 1000))
+    out += [("call_enable_config", case_call("enable_config"), 100),
+            ("call_read_parameter", case_call("read_parameter"), 100),
+            ("poll_send_command_report_data", case_poll_latency(), 1),
+            ("detector_update", case_detector(), 1000),
+            ("tracker_update", case_tracker(), 1000),
+            ("publish_messages", case_publish(), 500)]
+    try :
+        import numpy
+        out.append(("numpy_decode_per_frame", case_numpy(), 10000))
+    except ImportError :
+        pass
+    return out
+
+
+# meilleur temps par opération (µs) sur repeats mesures d'au moins min_us
+# chacune : le minimum écarte les interruptions de l'OS et du GC
+def measure(run, n, min_us, repeats=3):
+    best = None
+    for k in range(repeats):
+        gc.collect()
+        ops = 0
+        start = now_us()
+        while True :
+            run(n)
+            ops += n
+            elapsed = diff_us(now_us(), start)
+            if elapsed >= min_us :
+                break
+        per_op = max(elapsed, 1) / ops
+        if best is None or per_op < best :
+            best = per_op
+    return best
+
+
+#----------- allocations sur le chemin des rapports ------------
+# octets par trame ; *_legacy : parse_report et lecture d'origine, pour
+# comparaison ; fake_uart_readinto : part de l'UART simulée dans read_reports
+# (une vraie UART remplit le buffer sans allocation).
+# Sur CPython, parse_report n'alloue que l'entier de ticks_ms (Stats.last_frame_ms),
+# un petit entier sans allocation sur MicroPython ; l'original alloue la
+# tranche data[0:4] et, en lecture, le bytes rendu par ser.read().
+def allocations_per_frame(n=1024):
+    sensor = ld2410.LD2410(FakeUART())
+    legacy = LegacyParser()
+    uart = FakeUART(BASIC_FRAME, chunk=256)
+    reader = ld2410.LD2410(uart)
+    legacy_uart = FakeUART(BASIC_FRAME)
+    size = len(BASIC_FRAME)
+
+    def parse():
+        sensor.parse_report(BASIC_FRAME)
+
+    def parse_legacy():
+        legacy.parse_report(BASIC_FRAME)
+
+    def read():
+        uart.refill(size)
+        reader.read_reports()
+
+    def read_legacy():
+        legacy_uart.refill(size)
+        legacy.parse_report(legacy_uart.read())
+
+    scratch = memoryview(bytearray(256))
+    def fake_uart():
+        uart.refill(size)
+        uart.readinto(scratch)
+
+    result = {}
+    for name, op in (("parse_report", parse), ("parse_report_legacy", parse_legacy),
+                     ("read_reports", read), ("read_legacy", read_legacy),
+                     ("fake_uart_readinto", fake_uart)) :
+        for i in range(64): #préchauffage (caches, tailles de dict)
+            op()
+        result[name] = allocations(op, n)
+    return result
+
+
+#----------- latence des commandes selon le délai de réponse du module ------------
+# send_command d'origine : 20 ms d'attente fixe puis une seule lecture
+def legacy_send_command(ser, cmd_values):
+    frame = ld2410.HEADER + bytes([len(cmd_values), 0x00]) + cmd_values + ld2410.TERMINATOR
+    ser.write(frame)
+    utime.sleep_ms(20)
+    if ser.any() > 0 :
+        response = ser.read()
+        if len(response) < 10 :
+            response = ld2410.NULLDATA
+        return response
+    return ld2410.NULLDATA
+
+
+# pour chaque délai de réponse (ms) : durée moyenne d'une commande (ms) et
+# part des commandes qui ont reçu leur ACK, moteur de commandes (call) contre
+# send_command d'origine
+def ack_latency(delays=(0, 5, 15, 30, 60), n=10):
+    result = {}
+    for delay in delays :
+        uart = FakeUART(ack_delay_ms=delay)
+        sensor = ld2410.LD2410(uart)
+        entry = {}
+        for name, send in (("call", lambda : sensor.call("enable_config").ok),
+                           ("legacy", lambda : legacy_send_command(uart, bytes([0xff, 0x00, 0x01, 0x00]))[6:8] == b'\xff\x01')) :
+            ok = 0
+            start = now_us()
+            for i in range(n):
+                ok += 1 if send() else 0
+                uart.ack = b'' #ACK non lu (réponse trop tardive pour send_command)
+            entry[name + "_ms"] = diff_us(now_us(), start) / n / 1000
+            entry[name + "_ok"] = ok / n
+        result[str(delay)] = entry
+    return result
+
+
+#----------- passerelle : 1 à 64 capteurs simulés (CPython asyncio) ------------
+# SensorManager sur count capteurs SimulatedLD2410 émettant à rate_hz :
+# configuration en parallèle (enable_config + end_config sur tous), puis
+# pendant duration_s : trames par seconde du flux fusionné, part des trames
+# décodées qui y arrivent (delivered) et part des trames émises décodées à
+# temps (decoded)
+def manager_scaling(counts=(1, 2, 4, 8, 16, 32, 64), duration_s=1.0, rate_hz=50):
+    import asyncio
+    import time
+    from ld2410_async import AsyncLD2410
+    from ld2410_manager import SensorManager
+    from ld2410_sim import SimulatedLD2410, SimStream
+
+    async def one(count):
+        manager = SensorManager(ack_timeout_ms=2000)
+        sims = []
+        for k in range(count):
+            sims.append(SimulatedLD2410(rate_hz=rate_hz))
+            stream = SimStream(sims[-1])
+            manager.add(k, AsyncLD2410(stream, stream, manager.ack_timeout_ms))
+        def counters():
+            return (sum(sensor.stats_data.frames for sensor in manager.sensors.values()),
+                    sum(sim.reports for sim in sims))
+        manager.start()
+        start = time.perf_counter()
+        configured = await manager.run_all(AsyncLD2410.call, "enable_config")
+        await manager.run_all(AsyncLD2410.call, "end_config")
+        config_ms = (time.perf_counter() - start) * 1000
+        while not manager.queue.empty() :
+            manager.queue.get_nowait()
+        decoded, emitted = counters()
+        frames = 0
+        start = time.perf_counter()
+        end = start + duration_s
+        while True :
+            remaining = end - time.perf_counter()
+            if remaining <= 0 :
+                break
+            try :
+                await asyncio.wait_for(manager.queue.get(), remaining)
+            except asyncio.TimeoutError :
+                break
+            frames += 1
+        elapsed = time.perf_counter() - start
+        manager.stop()
+        while not manager.queue.empty() : #décodées avant la fin, pas encore lues
+            manager.queue.get_nowait()
+            frames += 1
+        end_decoded, end_emitted = counters()
+        return {"frames_per_s": frames / elapsed,
+                "delivered": frames / max(end_decoded - decoded, 1),
+                "decoded": (end_decoded - decoded) / max(end_emitted - emitted, 1),
+                "config_ms": config_ms,
+                "config_ok": sum(1 for r in configured.values() if getattr(r, "ok", False)),
+                "dropped": manager.dropped}
+
+    result = {}
+    for count in counts :
+        result[str(count)] = asyncio.run(one(count))
+    return result
+
+
+def run_all(quick=False):
+    results = {}
+    for name, run, n in cases():
+        if name in REPORT_PATH :
+            repeats = 5
+        else :
+            repeats = 1 if quick and n == 1 else 3
+        per_op = measure(run, n, 20000 if quick else 200000, repeats)
+        results[name] = {"us_per_op": per_op, "ops_per_s": 1000000 / per_op}
+        print("%-72s %12.1f ops/s %10.2f us" % (name, results[name]["ops_per_s"], results[name]["us_per_op"]))
+    allocs = allocations_per_frame()
+    for name in allocs :
+        print("allocations par trame, %-50s %12.2f %s" % (name, allocs[name], ALLOC_UNIT))
+    latency = ack_latency(n=3 if quick else 10)
+    for delay, entry in latency.items() :
+        print("ACK après %3s ms : call %6.1f ms (%3d %% ok), send_command d'origine %6.1f ms (%3d %% ok)"
+              % (delay, entry["call_ms"], entry["call_ok"] * 100, entry["legacy_ms"], entry["legacy_ok"] * 100))
+    scaling = None
+    if sys.implementation.name == "cpython" : #asyncio et simulateur CPython
+        scaling = manager_scaling((1, 8, 64) if quick else (1, 2, 4, 8, 16, 32, 64), 0.3 if quick else 1.0)
+        for count, entry in scaling.items() :
+            print("passerelle, %2s capteurs : %8.0f trames/s (%5.1f %% des décodées, %5.1f %% des émises), configuration %7.1f ms (%d ok), %d perdues"
+                  % (count, entry["frames_per_s"], entry["delivered"] * 100, entry["decoded"] * 100, entry["config_ms"],
+                     entry["config_ok"], entry["dropped"]))
+    return {"implementation": sys.implementation.name, "alloc_unit": ALLOC_UNIT,
+            "results": results, "allocations_per_frame": allocs, "ack_latency": latency,
+            "manager_scaling": scaling}
+
+
+# rend la liste des cas du chemin des rapports plus lents que baseline de
+# plus de tolerance, ou qui allouent plus de ALLOC_TOLERANCE octets par trame en plus
+def compare(report, baseline, tolerance=0.3):
+    regressions = []
+    for name, result in report["results"].items() :
+        ref = baseline["results"].get(name)
+        if ref is None :
+            continue
+        ratio = result["ops_per_s"] / ref["ops_per_s"]
+        if name not in REPORT_PATH :
+            flag = "(info)"
+        else :
+            flag = "REGRESSION" if ratio < 1 - tolerance else ""
+        print("%-72s %7.2fx %s" % (name, ratio, flag))
+        if flag == "REGRESSION" :
+            regressions.append(name)
+    for name, value in report["allocations_per_frame"].items() :
+        ref = baseline.get("allocations_per_frame", {}).get(name)
+        if ref is not None and baseline.get("alloc_unit") == report["alloc_unit"] and value > ref + ALLOC_TOLERANCE :
+            print("allocations par trame, %s : %.2f -> %.2f REGRESSION" % (name, ref, value))
+            regressions.append("alloc_" + name)
+    return regressions
+
+
+def main(argv):
+    quick = "--quick" in argv
+    save = argv[argv.index("--save") + 1] if "--save" in argv else None
+    baseline = argv[argv.index("--compare") + 1] if "--compare" in argv else None
+    tolerance = float(argv[argv.index("--tolerance") + 1]) if "--tolerance" in argv else 0.3
+    report = run_all(quick)
+    if save is not None :
+        with open(save, "w") as f :
+            json.dump(report, f)
+    if baseline is not None :
+        with open(baseline) as f :
+            regressions = compare(report, json.load(f), tolerance)
+        if regressions :
+            print("régressions :", regressions)
+            return 1
+    return 0
+
+
+if __name__ == "__main__" :
+    sys.exit(main(sys.argv[1:]))
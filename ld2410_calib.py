@@ -0,0 +1,91 @@
+# HLK-LD2410 B et C  - calibration automatique des sensibilités par porte
+# Pièce vide : le module passe en mode engineering, les énergies par porte
+# sont accumulées pendant duration_s dans des histogrammes (mémoire fixe,
+# percentile exact car les énergies sont des entiers 0..100), puis chaque
+# sensibilité = percentile du bruit + margin est écrite en une seule session
+# de configuration (apply_config).
+#
+#   motion, standstill = calibrate(human_sensor, duration_s=30, percentile=95, margin=10)
+from array import array
+
+from ld2410 import utime, GATE_COUNT, SensorConfig
+
+ENERGY_LEVELS = 101 #énergies 0 à 100
+
+
+#histogramme des énergies de chaque porte : GATE_COUNT x ENERGY_LEVELS compteurs
+class GateEnergyHistogram() :
+
+    def __init__(self):
+        self.counts = array('I', bytes(4 * GATE_COUNT * ENERGY_LEVELS))
+        self.samples = 0
+
+    def add(self, energies):
+        counts = self.counts
+        for gate in range(GATE_COUNT):
+            energy = energies[gate]
+            if energy >= ENERGY_LEVELS :
+                energy = ENERGY_LEVELS - 1
+            counts[gate * ENERGY_LEVELS + energy] += 1
+        self.samples += 1
+
+    #plus petite énergie e telle que percentile % des échantillons de la porte sont <= e
+    def percentile(self, gate, percentile):
+        if self.samples == 0 :
+            return 0
+        target = self.samples * percentile / 100
+        total = 0
+        base = gate * ENERGY_LEVELS
+        for energy in range(ENERGY_LEVELS):
+            total += self.counts[base + energy]
+            if total >= target :
+                return energy
+        return ENERGY_LEVELS - 1
+
+
+# mesure le bruit de fond puis écrit les sensibilités (si apply) ;
+# rend (sensibilités mouvement, sensibilités immobile), 0 si échec
+# chaque trame décodée est comptée (hook de stats_data) : read_reports peut en
+# décoder plusieurs d'un coup dans le même meas. Le mode engineering est
+# ensuite remis dans l'état de la dernière trame reçue avant la calibration.
+def calibrate(sensor, duration_s=30, percentile=95, margin=10, apply=True):
+    was_engineering = sensor.meas.engineering
+    if not (sensor.enable_config() and sensor.enable_engineering_mode() and sensor.end_config()) :
+        sensor.end_config()
+        print('calibrate failure : engineering mode')
+        return 0
+    moving = GateEnergyHistogram()
+    stationary = GateEnergyHistogram()
+    stats = sensor.stats_data
+    previous_hook = stats.hook
+    def hook(event, meas):
+        if event == "frame" and meas.engineering :
+            moving.add(meas.moving_gate_energy)
+            stationary.add(meas.stationary_gate_energy)
+        if previous_hook is not None :
+            previous_hook(event, meas)
+    stats.hook = hook
+    try :
+        start = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), start) < duration_s * 1000 :
+            if not sensor.read_reports() :
+                utime.sleep_ms(10)
+    finally :
+        stats.hook = previous_hook
+    if not was_engineering :
+        sensor.enable_config()
+        sensor.end_engineering_mode()
+        sensor.end_config()
+    if moving.samples == 0 :
+        print('calibrate failure : no engineering frame')
+        return 0
+    motion_sensitivity = [min(moving.percentile(g, percentile) + margin, 100) for g in range(GATE_COUNT)]
+    standstill_sensitivity = [min(stationary.percentile(g, percentile) + margin, 100) for g in range(GATE_COUNT)]
+    print('calibrate :', moving.samples, 'trames, mouvement', motion_sensitivity, 'immobile', standstill_sensitivity)
+    if apply :
+        report = sensor.apply_config(SensorConfig(motion_sensitivity=motion_sensitivity,
+                                                  standstill_sensitivity=standstill_sensitivity))
+        if report == 0 or not all([ok for name, ok in report]) :
+            print('calibrate failure : apply_config')
+            return 0
+    return motion_sensitivity, standstill_sensitivity
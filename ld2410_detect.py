@@ -0,0 +1,83 @@
+# HLK-LD2410 B et C  - détection de présence par machine d'états
+# A appeler sur chaque trame décodée (travail constant par trame) :
+#
+#   detector = PresenceDetector(callback=on_change, zones=[(0, 150), (150, 400)])
+#   while True :
+#       if human_sensor.read_reports() :
+#           detector.update(human_sensor.meas)
+#
+# Hystérésis : seuils d'énergie d'entrée (enter_*) plus hauts que ceux de sortie
+# (exit_*) ; un changement (présence, absence ou zone) doit durer enter_hold_ms
+# ou exit_hold_ms avant d'être pris en compte. callback(present, zone, distance)
+# n'est appelé que sur les changements d'état, jamais à chaque trame.
+# zones : liste de (distance min, distance max) en cm ; une cible hors de toutes
+# les zones est ignorée. Sans zones, zone vaut 0 dès qu'une cible est présente.
+import ld2410
+from ld2410 import utime
+
+
+class PresenceDetector() :
+
+    def __init__(self, enter_moving=50, enter_stationary=50, exit_moving=30, exit_stationary=30,
+                 enter_hold_ms=0, exit_hold_ms=2000, zones=None, callback=None):
+        self.enter_moving = enter_moving
+        self.enter_stationary = enter_stationary
+        self.exit_moving = exit_moving
+        self.exit_stationary = exit_stationary
+        self.enter_hold_ms = enter_hold_ms
+        self.exit_hold_ms = exit_hold_ms
+        self.zones = zones
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.present = False
+        self.zone = None      #zone validée, None si absence
+        self.distance = 0     #distance de la cible retenue (cm)
+        self._candidate = None #zone en attente de validation
+        self._since = 0       #début de l'attente (ticks_ms)
+
+    #zone contenant distance, None si aucune
+    def _zone_of(self, distance):
+        if self.zones is None :
+            return 0
+        for k in range(len(self.zones)):
+            low, high = self.zones[k]
+            if low <= distance < high :
+                return k
+        return None
+
+    # rend True si l'état (présence ou zone) vient de changer
+    def update(self, meas, now_ms=None):
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        if self.present :
+            moving_threshold, stationary_threshold = self.exit_moving, self.exit_stationary
+        else :
+            moving_threshold, stationary_threshold = self.enter_moving, self.enter_stationary
+        distance = None
+        if meas.state & ld2410.STATE_MOVING_TARGET and meas.moving_energy >= moving_threshold :
+            distance = meas.moving_distance
+        if meas.state & ld2410.STATE_STATIONARY_TARGET and meas.stationary_energy >= stationary_threshold :
+            if distance is None or meas.stationary_distance < distance :
+                distance = meas.stationary_distance
+        zone = None if distance is None else self._zone_of(distance)
+        if zone == self.zone :
+            self._candidate = zone
+            if zone is not None :
+                self.distance = distance
+            return False
+        if zone != self._candidate :
+            #nouveau changement : début de l'attente
+            self._candidate = zone
+            self._since = now_ms
+        hold = self.exit_hold_ms if zone is None else self.enter_hold_ms
+        if utime.ticks_diff(now_ms, self._since) < hold :
+            return False
+        self.zone = zone
+        self.present = zone is not None
+        if zone is not None :
+            self.distance = distance
+        if self.callback is not None :
+            self.callback(self.present, zone, self.distance)
+        return True
@@ -0,0 +1,52 @@
+# HLK-LD2410 B et C  - construction des trames émises par le module (ACK et rapports)
+# Utilisé par le simulateur (ld2410_sim), les mesures (ld2410_bench) et les
+# tests ; sans dépendance au-delà de ld2410 pour tourner aussi sur MicroPython.
+from ld2410 import HEADER, TERMINATOR, REPORT_HEADER, REPORT_TERMINATOR, GATE_COUNT
+
+
+#trame ACK de la commande cmd (mot de commande cmd | 0x0100, statut, données)
+def build_ack(cmd, status=0, payload=b''):
+    ack = cmd | 0x0100
+    body = bytes([ack & 0x00FF, (ack & 0xFF00) >> 8, status & 0x00FF, (status & 0xFF00) >> 8]) + payload
+    return HEADER + bytes([len(body), 0x00]) + body + TERMINATOR
+
+
+#trame de rapport (2.3) : engineering si les énergies par porte sont données
+def build_report(state, moving_distance, moving_energy, stationary_distance, stationary_energy,
+                 detection_distance, moving_gate_energy=None, stationary_gate_energy=None, light=0, out_pin=0):
+    engineering = moving_gate_energy is not None
+    body = bytes([0x01 if engineering else 0x02, 0xaa, state,
+                  moving_distance & 0xFF, moving_distance >> 8, moving_energy,
+                  stationary_distance & 0xFF, stationary_distance >> 8, stationary_energy,
+                  detection_distance & 0xFF, detection_distance >> 8])
+    if engineering :
+        body += bytes([GATE_COUNT - 1, GATE_COUNT - 1]) + bytes(moving_gate_energy) \
+                + bytes(stationary_gate_energy) + bytes([light, out_pin])
+    body += bytes([0x55, 0x00])
+    return REPORT_HEADER + bytes([len(body), 0x00]) + body + REPORT_TERMINATOR
+
+
+# flux UART rejouable (mesures, tests) : frames rapports (un sur quatre en
+# engineering) avec, intercalés, des octets parasites, des trames coupées et
+# des ACK de commande ; rend (flux, liste des trames de rapport valides)
+def capture_stream(frames=100):
+    out = bytearray()
+    reports = []
+    for k in range(frames):
+        distance = 50 + (k * 7) % 300
+        energy = (k * 11) % 101
+        if k % 4 == 3 :
+            frame = build_report(k % 4, distance, energy, distance + 40, 100 - energy, distance + 60,
+                                 [(energy + g * 9) % 101 for g in range(GATE_COUNT)],
+                                 [(energy + g * 5) % 101 for g in range(GATE_COUNT)], k & 0xFF, k & 1)
+        else :
+            frame = build_report(k % 4, distance, energy, distance + 40, 100 - energy, distance + 60)
+        if k % 10 == 5 :
+            out += b'\x00\x55\xf4\xf3' #parasites, dont un début d'en-tête
+        if k % 25 == 12 :
+            out += frame[:15]          #trame coupée (octets perdus)
+        if k % 30 == 20 :
+            out += build_ack(0x00FF, 0, b'\x01\x00\x40\x00')
+        out += frame
+        reports.append(frame)
+    return bytes(out), reports
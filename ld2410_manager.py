@@ -0,0 +1,100 @@
+# HLK-LD2410 B et C  - gestion de plusieurs capteurs depuis une passerelle (CPython asyncio)
+# Chaque capteur est un AsyncLD2410 avec sa tâche de lecture ; chaque trame
+# décodée (hook "frame" de ses Stats, pas l'itérateur qui fusionne les trames
+# d'une même lecture) est copiée dans un seul flux horodaté :
+#
+#   manager = SensorManager()
+#   await manager.add_serial("salon", "/dev/ttyUSB0")
+#   await manager.add_serial("couloir", "/dev/ttyUSB1")
+#   manager.start()
+#   await manager.run_all(AsyncLD2410.enable_config)   # configuration en parallèle
+#   async for timestamp, sensor_id, meas in manager :
+#       ...
+import asyncio
+import time
+
+from ld2410_async import AsyncLD2410
+
+
+class SensorManager() :
+
+    def __init__(self, queue_size=1024, ack_timeout_ms=500):
+        self.sensors = {}  #id -> AsyncLD2410
+        self.ack_timeout_ms = ack_timeout_ms
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0   #mesures perdues (file pleine : la plus ancienne est jetée)
+        self.running = False
+        self._last = {}    #id -> time.monotonic() de la dernière mesure
+
+    #le hook "frame" du capteur (un éventuel hook existant est toujours appelé)
+    #dépose chaque trame décodée dans la file
+    def add(self, sensor_id, sensor):
+        self.sensors[sensor_id] = sensor
+        self._last[sensor_id] = None
+        previous = sensor.stats_data.hook
+        def hook(event, data):
+            if event == "frame" and self.running :
+                self._put(sensor_id, data)
+            if previous is not None :
+                previous(event, data)
+        sensor.stats_data.hook = hook
+        return sensor
+
+    #ouvre un port série (module pyserial-asyncio) et ajoute le capteur
+    async def add_serial(self, sensor_id, port, baudrate=256000):
+        try :
+            import serial_asyncio
+        except ImportError :
+            raise ImportError("add_serial needs the pyserial-asyncio package")
+        reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
+        return self.add(sensor_id, AsyncLD2410(reader, writer, self.ack_timeout_ms))
+
+    #---------lecture ----------
+    def start(self):
+        self.running = True
+        for sensor in self.sensors.values():
+            sensor.start()
+
+    def stop(self):
+        self.running = False
+        for sensor in self.sensors.values():
+            sensor.stop()
+
+    def _put(self, sensor_id, meas):
+        queue = self.queue
+        self._last[sensor_id] = time.monotonic()
+        if queue.full() :
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait((time.time(), sensor_id, meas.copy()))
+
+    #flux fusionné : (timestamp, id capteur, Measurement)
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    #---------commandes en parallèle ----------
+    # lance func(sensor, *args) sur tous les capteurs en même temps
+    # rend {id: résultat} (l'exception si la commande a levé une erreur)
+    async def run_all(self, func, *args):
+        ids = list(self.sensors)
+        results = await asyncio.gather(*[func(self.sensors[i], *args) for i in ids], return_exceptions=True)
+        return dict(zip(ids, results))
+
+    #---------santé ----------
+    # {id: {frames, age (s depuis la dernière mesure, None si aucune),
+    #       communication_error, resync, running}}
+    def health(self):
+        now = time.monotonic()
+        report = {}
+        for sensor_id, sensor in self.sensors.items():
+            last = self._last[sensor_id]
+            report[sensor_id] = {
+                "frames": sensor.stats_data.frames,
+                "age": None if last is None else now - last,
+                "communication_error": sensor.communication_error,
+                "resync": sensor.decoder.resync,
+                "running": sensor.running }
+        return report
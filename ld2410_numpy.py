@@ -0,0 +1,279 @@
+# HLK-LD2410 B et C  - décodage en masse et analyses hors ligne (CPython + NumPy)
+# Décode d'un coup un grand buffer ou un fichier de capture (lu en memmap) :
+# les REPORT_HEADER sont cherchés de façon vectorisée, les trames valides sont
+# rendues dans un tableau structuré NumPy (REPORT_DTYPE), une ligne par trame.
+#
+#   reports = decode_capture("capture.bin")            # flux brut de l'UART
+#   times, reports = decode_recording("ld2410.bin")    # fichier ld2410_record
+#   timeline = occupancy_timeline(reports, times)
+#   stats = gate_energy_stats(reports)
+#   track = track_reports(reports, times)
+import numpy as np
+
+from ld2410 import GATE_COUNT, REPORT_MAX_LEN
+from ld2410_record import FILE_HEADER, MAGIC
+from ld2410_track import AlphaBetaTracker
+
+REPORT_DTYPE = np.dtype([
+    ("offset", "<i8"),                 #position de la trame dans le buffer
+    ("engineering", "?"),
+    ("state", "u1"),
+    ("moving_distance", "<u2"),
+    ("moving_energy", "u1"),
+    ("stationary_distance", "<u2"),
+    ("stationary_energy", "u1"),
+    ("detection_distance", "<u2"),
+    ("max_moving_gate", "u1"),
+    ("max_stationary_gate", "u1"),
+    ("moving_gate_energy", "u1", (GATE_COUNT,)),
+    ("stationary_gate_energy", "u1", (GATE_COUNT,)),
+    ("light", "u1"),
+    ("out_pin", "u1")])
+
+INTERVAL_DTYPE = np.dtype([("start", "<f8"), ("end", "<f8"), ("occupied", "?")])
+
+TRACK_DTYPE = np.dtype([("tracking", "?"), ("distance", "<f8"), ("velocity", "<f8"), ("confidence", "<f8")])
+
+
+def _as_array(data):
+    if isinstance(data, np.ndarray) :
+        return data.view(np.uint8).reshape(-1)
+    return np.frombuffer(data, np.uint8)
+
+
+def _word(d, k):
+    return d[k].astype(np.uint16) | (d[k + 1].astype(np.uint16) << 8)
+
+
+#positions et fins des trames d'en-tête h0 h0-1 h0-2 h0-3 et de terminateur t0 t0-1 t0-2 t0-3
+def _find(d, h0, t0, min_len):
+    n = len(d)
+    starts = np.flatnonzero(d[:max(n - min_len + 1, 0)] == h0)
+    starts = starts[(d[starts + 1] == h0 - 1) & (d[starts + 2] == h0 - 2) & (d[starts + 3] == h0 - 3)]
+    end = starts + _word(d, starts + 4).astype(np.int64) + 10
+    inside = (end <= n) & (end - starts <= REPORT_MAX_LEN)
+    starts, end = starts[inside], end[inside]
+    ok = (d[end - 4] == t0) & (d[end - 3] == t0 - 1) & (d[end - 2] == t0 - 2) & (d[end - 1] == t0 - 3)
+    return starts[ok], end[ok]
+
+
+# positions des trames de rapport valides (mêmes contrôles que decode_report,
+# terminateur compris), plus les trames ACK si acks ; une fausse trame à
+# l'intérieur d'une trame valide est écartée
+def find_frames(data, acks=False):
+    d = _as_array(data)
+    starts, end = _find(d, 0xf4, 0xf8, 23)
+    ok = ((d[starts + 4] == 0x0d) | (d[starts + 4] == 0x23)) & (d[starts + 5] == 0) & (d[starts + 7] == 0xaa)
+    starts, end = starts[ok], end[ok]
+    if acks :
+        ack_starts, ack_end = _find(d, 0xfd, 0x04, 14)
+        starts = np.concatenate((starts, ack_starts))
+        end = np.concatenate((end, ack_end))
+        order = np.argsort(starts, kind="stable")
+        starts, end = starts[order], end[order]
+    if len(starts) > 1 :
+        keep = np.ones(len(starts), bool)
+        keep[1:] = starts[1:] >= np.maximum.accumulate(end)[:-1]
+        starts = starts[keep]
+    return starts.astype(np.int64)
+
+
+# décode toutes les trames de rapport de data (bytes, bytearray, memmap...)
+def decode_frames(data, starts=None):
+    d = _as_array(data)
+    if starts is None :
+        starts = find_frames(d)
+    out = np.zeros(len(starts), REPORT_DTYPE)
+    s = starts
+    out["offset"] = s
+    out["state"] = d[s + 8]
+    out["moving_distance"] = _word(d, s + 9)
+    out["moving_energy"] = d[s + 11]
+    out["stationary_distance"] = _word(d, s + 12)
+    out["stationary_energy"] = d[s + 14]
+    out["detection_distance"] = _word(d, s + 15)
+    engineering = (d[s + 6] == 0x01) & (d[s + 4] == 0x23) \
+                  & (d[np.minimum(s + 17, len(d) - 1)] < GATE_COUNT) \
+                  & (d[np.minimum(s + 18, len(d) - 1)] < GATE_COUNT)
+    out["engineering"] = engineering
+    rows = np.flatnonzero(engineering)
+    if len(rows) :
+        e = s[rows]
+        gates = np.arange(GATE_COUNT)
+        moving_n = d[e + 17].astype(np.int64)
+        stationary_n = d[e + 18].astype(np.int64)
+        out["max_moving_gate"][rows] = moving_n
+        out["max_stationary_gate"][rows] = stationary_n
+        moving = d[e[:, None] + 19 + gates]
+        moving[gates > moving_n[:, None]] = 0
+        stationary_start = e + 20 + moving_n
+        stationary = d[stationary_start[:, None] + gates]
+        stationary[gates > stationary_n[:, None]] = 0
+        out["moving_gate_energy"][rows] = moving
+        out["stationary_gate_energy"][rows] = stationary
+        extra = stationary_start + stationary_n + 1
+        out["light"][rows] = d[extra]
+        out["out_pin"][rows] = d[extra + 1]
+    return out
+
+
+#fichier de capture brute, lu en memmap (pas de copie en mémoire)
+def decode_capture(path):
+    return decode_frames(np.memmap(path, np.uint8, "r"))
+
+
+# positions des trames enregistrées dans d (fichier sans son en-tête) et
+# écarts en ms : chaque enregistrement est écart (2 octets), longueur, trame.
+# Les trames (rapports et ACK, valides ou non) sont cherchées de façon
+# vectorisée : un enregistrement commence 3 octets avant, avec la longueur de
+# la trame. Les suites d'enregistrements chaînés (chacun finit où commence le
+# suivant) sont prises d'un bloc ; seuls les enregistrements qui ne sont pas
+# des trames (données quelconques passées à FrameRecorder.record, dernière
+# trame tronquée) sont parcourus un par un. Une fausse trame à l'intérieur
+# d'un enregistrement n'est jamais atteinte par la chaîne.
+def _records(d):
+    n = len(d)
+    found = []
+    for h0, t0 in ((0xf4, 0xf8), (0xfd, 0x04)) :
+        frames, end = _find(d, h0, t0, 10)
+        keep = (frames >= 3) & (d[np.maximum(frames - 1, 0)] == end - frames)
+        found.append(frames[keep] - 3)
+    cand = np.sort(np.concatenate(found))
+    after = cand + 3 + d[cand + 2].astype(np.int64)
+    last = np.flatnonzero(after[:-1] != cand[1:]) #fin de chaque suite chaînée
+    last = np.append(last, len(cand) - 1)
+    runs = []
+    pos = 0
+    while pos + 3 <= n :
+        i = int(np.searchsorted(cand, pos))
+        if i < len(cand) and cand[i] == pos :
+            j = int(last[np.searchsorted(last, i)])
+            runs.append(cand[i:j + 1])
+            pos = int(after[j])
+        else :
+            length = int(d[pos + 2])
+            if pos + 3 + length > n :
+                break #dernière trame tronquée
+            runs.append(np.array([pos], np.int64))
+            pos += 3 + length
+    starts = np.concatenate(runs) if runs else np.zeros(0, np.int64)
+    deltas = d[starts].astype(np.int64) | (d[starts + 1].astype(np.int64) << 8)
+    return starts + 3, deltas
+
+
+# fichier(s) ld2410_record : rend (instants en ms depuis la première trame, rapports)
+# les instants sont la somme cumulée des écarts de tous les enregistrements,
+# ACK et trames invalides compris ; seules les trames de rapport valides sont
+# ensuite décodées (vectorisé)
+def decode_recording(*paths):
+    times = []
+    reports = []
+    offset = 0
+    for path in paths :
+        d = np.memmap(path, np.uint8, "r")
+        if bytes(d[:4]) != MAGIC :
+            raise ValueError("%s is not an LD2410 recording" % path)
+        d = d[len(FILE_HEADER):]
+        starts, deltas = _records(d)
+        time = np.cumsum(deltas) + offset
+        if len(time) :
+            offset = time[-1]
+        ok = _valid_reports(d, starts)
+        times.append(time[ok])
+        reports.append(decode_frames(d, starts[ok]))
+    if not reports :
+        return np.zeros(0, np.int64), np.zeros(0, REPORT_DTYPE)
+    return np.concatenate(times), np.concatenate(reports)
+
+
+#trames de rapport complètes et valides parmi les positions starts (mêmes contrôles que find_frames)
+def _valid_reports(d, starts):
+    ok = np.zeros(len(starts), bool)
+    inside = starts + 23 <= len(d)
+    s = starts[inside]
+    end = s + _word(d, s + 4).astype(np.int64) + 10
+    good = (d[s] == 0xf4) & (d[s + 1] == 0xf3) & (d[s + 2] == 0xf2) & (d[s + 3] == 0xf1) \
+           & ((d[s + 4] == 0x0d) | (d[s + 4] == 0x23)) & (d[s + 5] == 0) & (d[s + 7] == 0xaa) & (end <= len(d))
+    end = np.where(good, end, s + 4)
+    good &= (d[end - 4] == 0xf8) & (d[end - 3] == 0xf7) & (d[end - 2] == 0xf6) & (d[end - 1] == 0xf5)
+    ok[np.flatnonzero(inside)] = good
+    return ok
+
+
+#----------- analyses ------------
+# périodes d'occupation : une ligne (début, fin, occupé) par changement d'état
+# times : instants des trames (par défaut leur rang)
+def occupancy_timeline(reports, times=None):
+    if times is None :
+        times = np.arange(len(reports))
+    times = np.asarray(times, np.float64)
+    if len(reports) == 0 :
+        return np.zeros(0, INTERVAL_DTYPE)
+    occupied = reports["state"] != 0
+    change = np.flatnonzero(occupied[1:] != occupied[:-1]) + 1
+    begin = np.concatenate(([0], change))
+    out = np.zeros(len(begin), INTERVAL_DTYPE)
+    out["start"] = times[begin]
+    out["end"] = np.concatenate((times[change], times[-1:]))
+    out["occupied"] = occupied[begin]
+    return out
+
+
+# statistiques par porte des énergies (trames engineering seulement) :
+# {"moving"/"stationary": {"count", "mean", "std", "min", "max", "p50", "p90", "p99"}},
+# tableaux de 9 valeurs (None sans trame engineering)
+def gate_energy_stats(reports, percentiles=(50, 90, 99)):
+    engineering = reports[reports["engineering"]]
+    stats = {}
+    for kind in ("moving", "stationary"):
+        energy = engineering[kind + "_gate_energy"].astype(np.float64)
+        if len(energy) == 0 :
+            stats[kind] = None
+            continue
+        entry = {
+            "count": len(energy),
+            "mean": energy.mean(axis=0),
+            "std": energy.std(axis=0),
+            "min": energy.min(axis=0),
+            "max": energy.max(axis=0)}
+        for p, values in zip(percentiles, np.percentile(energy, percentiles, axis=0)):
+            entry["p%d" % p] = values
+        stats[kind] = entry
+    return stats
+
+
+# suivi alpha-beta de toutes les trames (même filtre que ld2410_track, mêmes
+# résultats) : la fusion des distances est vectorisée, le filtre est récursif
+# donc parcouru trame par trame ; rend un tableau TRACK_DTYPE
+# times : instants des trames en ms (par défaut 100 ms d'écart, 10 Hz)
+def track_reports(reports, times=None, tracker=None):
+    if tracker is None :
+        tracker = AlphaBetaTracker()
+    n = len(reports)
+    if times is None :
+        times = np.arange(n) * 100
+    dt = np.diff(np.asarray(times, np.int64), prepend=times[0] if n else 0)
+    state = reports["state"]
+    moving_energy = reports["moving_energy"].astype(np.float64)
+    stationary_energy = reports["stationary_energy"].astype(np.float64)
+    moving = ((state & 1) != 0) & (moving_energy > tracker.min_energy)
+    stationary = ((state & 2) != 0) & (stationary_energy > tracker.min_energy)
+    we_moving = np.where(moving, moving_energy, 0.0)
+    we_stationary = np.where(stationary, stationary_energy, 0.0)
+    total = we_moving + we_stationary
+    distance = np.where(total > 0, (reports["moving_distance"] * we_moving + reports["stationary_distance"] * we_stationary)
+                        / np.where(total > 0, total, 1), 0.0)
+    #une seule cible : sa distance exacte (entier), comme fuse()
+    distance = np.where(moving & ~stationary, reports["moving_distance"], distance)
+    distance = np.where(stationary & ~moving, reports["stationary_distance"], distance)
+    energy = np.maximum(we_moving, we_stationary)
+    present = moving | stationary
+    out = np.zeros(n, TRACK_DTYPE)
+    step = tracker.step
+    track = []
+    for d, e, p, t in zip(distance.tolist(), energy.tolist(), present.tolist(), dt.tolist()):
+        tracking = step(d if p else None, e, t)
+        track.append((tracking, tracker.distance if tracking else 0.0, tracker.velocity, tracker.confidence))
+    if n :
+        out[:] = track
+    return out
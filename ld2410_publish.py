@@ -0,0 +1,299 @@
+# HLK-LD2410 B et C  - publication des mesures vers MQTT / HTTP / fichier
+# La boucle de lecture ne fait que déposer les mesures dans une file bornée
+# (offer, jamais bloquant) ; une tâche asyncio (uasyncio sur MicroPython) les
+# envoie par lots au puits (sink). Un envoi lent ou en échec ne bloque pas la
+# lecture : la file déborde selon sa politique et l'envoi est réessayé avec
+# un délai croissant.
+#
+#   publisher = Publisher(MQTTSink(client, "maison/ld2410"), MessageQueue(64, COALESCE))
+#   publisher.start()
+#   while True :
+#       if human_sensor.read_reports() :
+#           publisher.offer("salon", human_sensor.meas)
+#       await asyncio.sleep_ms(10)
+#
+# Politiques de file : DROP_OLDEST (la plus ancienne mesure est jetée) ou
+# COALESCE (une seule mesure en attente par capteur, remplacée par la plus
+# récente : l'état courant plutôt que l'historique).
+# Messages : JSON, un lot = une liste ; en codage delta seuls les champs qui
+# ont changé depuis le message précédent du même capteur sont envoyés, avec
+# un message complet ("key": 1) tous les keyframe_every messages et après
+# chaque échec d'envoi.
+try :
+    import asyncio
+except ImportError :
+    import uasyncio as asyncio
+import json
+import random
+
+from ld2410 import utime
+
+DROP_OLDEST = 0
+COALESCE = 1
+
+#champs publiés (énergies par porte en plus pour les trames engineering)
+FIELDS = ("state", "moving_distance", "moving_energy", "stationary_distance",
+          "stationary_energy", "detection_distance")
+
+
+#Measurement -> dict publié
+def message(meas):
+    msg = {}
+    for name in FIELDS :
+        msg[name] = getattr(meas, name)
+    if meas.engineering :
+        msg["moving_gate_energy"] = list(meas.moving_gate_energy)
+        msg["stationary_gate_energy"] = list(meas.stationary_gate_energy)
+        msg["light"] = meas.light
+        msg["out_pin"] = meas.out_pin
+    return msg
+
+
+#----------- file bornée (tampon circulaire) ------------
+class MessageQueue() :
+
+    def __init__(self, size=64, policy=DROP_OLDEST):
+        self.size = size
+        self.policy = policy
+        self._items = [None] * size #[id capteur, instant ms, message]
+        self._head = 0
+        self.count = 0
+        self._pending = {}          #COALESCE : id capteur -> position dans _items
+        self.dropped = 0            #messages jetés (file pleine)
+        self.coalesced = 0          #messages remplacés par un plus récent
+        self.event = asyncio.Event()
+
+    def __len__(self):
+        return self.count
+
+    def put(self, sensor_id, msg, now_ms=None):
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        if self.policy == COALESCE and sensor_id in self._pending :
+            item = self._items[self._pending[sensor_id]]
+            item[1] = now_ms
+            item[2] = msg
+            self.coalesced += 1
+            return
+        if self.count == self.size :
+            self._pop()
+            self.dropped += 1
+        k = (self._head + self.count) % self.size
+        self._items[k] = [sensor_id, now_ms, msg]
+        if self.policy == COALESCE :
+            self._pending[sensor_id] = k
+        self.count += 1
+        self.event.set()
+
+    def _pop(self):
+        k = self._head
+        item = self._items[k]
+        self._items[k] = None
+        self._head = (k + 1) % self.size
+        self.count -= 1
+        if self._pending.get(item[0]) == k :
+            del self._pending[item[0]]
+        return item
+
+    #au plus n éléments, du plus ancien au plus récent
+    def get_batch(self, n):
+        batch = []
+        while self.count and len(batch) < n :
+            batch.append(self._pop())
+        if not self.count :
+            self.event.clear()
+        return batch
+
+
+#----------- codage delta ------------
+class DeltaEncoder() :
+
+    def __init__(self, keyframe_every=50):
+        self.keyframe_every = keyframe_every
+        self._last = {}   #id capteur -> dernier message envoyé
+        self._count = {}  #id capteur -> messages depuis le dernier complet
+
+    #le prochain message de chaque capteur sera complet (destinataire à resynchroniser)
+    def reset(self):
+        self._last = {}
+
+    def encode(self, sensor_id, now_ms, msg):
+        last = self._last.get(sensor_id)
+        count = self._count.get(sensor_id, 0)
+        self._last[sensor_id] = msg
+        if last is None or count + 1 >= self.keyframe_every :
+            self._count[sensor_id] = 0
+            out = {"id": sensor_id, "t": now_ms, "key": 1}
+            out.update(msg)
+            return out
+        self._count[sensor_id] = count + 1
+        out = {"id": sensor_id, "t": now_ms}
+        for name, value in msg.items() :
+            if last.get(name) != value :
+                out[name] = value
+        return out
+
+
+#----------- puits ------------
+# send(payload) : payload = bytes JSON d'un lot ; lève OSError en cas d'échec
+
+# une ligne JSON par lot (tests, journal local)
+class FileSink() :
+
+    def __init__(self, path):
+        self.path = path
+
+    async def send(self, payload):
+        with open(self.path, 'ab') as f :
+            f.write(payload)
+            f.write(b'\n')
+
+
+# client MQTT déjà connecté : umqtt.simple.MQTTClient (MicroPython) ou
+# paho.mqtt.client.Client (CPython) ; après un échec le client est reconnecté
+# (reconnect() de paho, sinon connect()) avant l'envoi suivant
+class MQTTSink() :
+
+    def __init__(self, client, topic, qos=0):
+        self.client = client
+        self.topic = topic
+        self.qos = qos
+        self.connected = True
+
+    async def send(self, payload):
+        client = self.client
+        try :
+            if not self.connected :
+                if hasattr(client, "reconnect") :
+                    client.reconnect()
+                else :
+                    client.connect()
+                self.connected = True
+            info = client.publish(self.topic, payload, qos=self.qos)
+        except Exception as e :
+            self.connected = False
+            raise OSError("mqtt publish failed: %r" % e)
+        if getattr(info, "rc", 0) : #paho rend un code au lieu de lever une erreur
+            self.connected = False
+            raise OSError("mqtt publish failed: rc %d" % info.rc)
+
+
+# POST HTTP/1.0 minimal par asyncio (pas de dépendance, MicroPython compris)
+class HTTPSink() :
+
+    def __init__(self, host, port=80, path="/", timeout_s=5):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout_s = timeout_s
+
+    async def send(self, payload):
+        try :
+            await asyncio.wait_for(self._post(payload), self.timeout_s)
+        except asyncio.TimeoutError :
+            #pas une OSError sur MicroPython et CPython < 3.11 : Publisher ne la rattraperait pas
+            raise OSError("http post timeout")
+
+    async def _post(self, payload):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try :
+            writer.write(("POST %s HTTP/1.0\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+                          % (self.path, self.host, len(payload))).encode())
+            writer.write(payload)
+            await writer.drain()
+            status = await reader.readline()
+        finally :
+            writer.close()
+        parts = status.split()
+        if len(parts) < 2 or not parts[1].startswith(b"2") :
+            raise OSError("http post failed: %r" % status)
+
+
+#----------- tâche d'envoi ------------
+class Publisher() :
+
+    # batch_size : messages max par envoi ; batch_ms : attente max pour remplir un lot
+    # retry_ms / max_retry_ms : délai avant nouvel essai, doublé à chaque échec
+    #   (avec +-25 % d'aléa pour ne pas resynchroniser plusieurs passerelles)
+    def __init__(self, sink, queue=None, batch_size=20, batch_ms=200, delta=True, keyframe_every=50,
+                 retry_ms=500, max_retry_ms=30000):
+        self.sink = sink
+        self.queue = queue if queue is not None else MessageQueue()
+        self.batch_size = batch_size
+        self.batch_ms = batch_ms
+        self.encoder = DeltaEncoder(keyframe_every) if delta else None
+        self.retry_ms = retry_ms
+        self.max_retry_ms = max_retry_ms
+        self.sent = 0     #messages envoyés
+        self.batches = 0  #lots envoyés
+        self.failures = 0 #envois en échec
+        self.running = False
+        self._task = None
+
+    #dépose une mesure (copiée sous forme de message), jamais bloquant
+    def offer(self, sensor_id, meas, now_ms=None):
+        self.queue.put(sensor_id, message(meas), now_ms)
+
+    def encode(self, batch):
+        out = []
+        for sensor_id, now_ms, msg in batch :
+            if self.encoder is not None :
+                out.append(self.encoder.encode(sensor_id, now_ms, msg))
+            else :
+                msg = dict(msg)
+                msg["id"] = sensor_id
+                msg["t"] = now_ms
+                out.append(msg)
+        return json.dumps(out).encode()
+
+    def start(self):
+        if self._task is None :
+            self.running = True
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        self.running = False
+        if self._task is not None :
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        queue = self.queue
+        while self.running :
+            await queue.event.wait()
+            if len(queue) < self.batch_size :
+                await asyncio.sleep(self.batch_ms / 1000)
+            await self.flush()
+
+    # envoie tout ce qui est en file, lot par lot ; un lot en échec est
+    # réessayé jusqu'au succès (pendant ce temps la file continue de déborder
+    # selon sa politique), rend le nb de messages envoyés
+    async def flush(self):
+        count = 0
+        delay = self.retry_ms
+        while len(self.queue) :
+            batch = self.queue.get_batch(self.batch_size)
+            payload = self.encode(batch)
+            while True :
+                try :
+                    await self.sink.send(payload)
+                    break
+                except OSError as e :
+                    self.failures += 1
+                    print('publish failure :', e)
+                    if self.encoder is not None :
+                        #le destinataire a pu perdre des messages : lot complet
+                        self.encoder.reset()
+                        payload = self.encode(batch)
+                    await asyncio.sleep((delay + random.randint(-delay // 4, delay // 4)) / 1000)
+                    delay = min(delay * 2, self.max_retry_ms)
+            delay = self.retry_ms
+            self.sent += len(batch)
+            self.batches += 1
+            count += len(batch)
+        return count
+
+    def stats(self):
+        return {"queued": len(self.queue), "dropped": self.queue.dropped, "coalesced": self.queue.coalesced,
+                "sent": self.sent, "batches": self.batches, "failures": self.failures}
@@ -0,0 +1,123 @@
+# HLK-LD2410 B et C  - enregistrement binaire des trames brutes et relecture
+# Format : en-tête de fichier b'LD24' + version (1) + 3 octets réservés, puis
+# pour chaque trame : écart depuis la trame précédente en ms (2 octets little
+# endian, saturé à 65535), longueur (1 octet), octets de la trame.
+# Taille bornée : au-delà de max_bytes le fichier est renommé en path + '.1'
+# (l'ancien .1 est effacé) et un nouveau fichier est commencé.
+#
+#   human_sensor.recorder = FrameRecorder("ld2410.bin")   # read_reports() enregistre chaque trame
+#   ...
+#   FrameReplayer("ld2410.bin").replay(ld2410.LD2410(None))
+import os
+
+from ld2410 import utime
+
+MAGIC = b'LD24'
+VERSION = 1
+FILE_HEADER = MAGIC + bytes([VERSION, 0, 0, 0])
+RECORD_HEADER_LEN = 3
+
+
+class FrameRecorder() :
+
+    def __init__(self, path, max_bytes=65536):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.records = 0
+        self._head = bytearray(RECORD_HEADER_LEN) #réutilisé pour chaque trame
+        self._last_ms = None
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'ab')
+        self.size = self.file.seek(0, 2)
+        if self.size == 0 :
+            self.size = self.file.write(FILE_HEADER)
+
+    def _rotate(self):
+        self.file.close()
+        old = self.path + '.1'
+        try :
+            os.remove(old)
+        except OSError :
+            pass
+        os.rename(self.path, old)
+        self._open()
+
+    # data[offset:offset+length] : la trame (par défaut data entier), par ex.
+    # record(decoder.mv, i, decoder.frame_len) sans copie depuis le décodeur
+    def record(self, data, offset=0, length=None, now_ms=None):
+        if length is None :
+            length = len(data) - offset
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        delta = 0 if self._last_ms is None else min(utime.ticks_diff(now_ms, self._last_ms), 0xFFFF)
+        self._last_ms = now_ms
+        if self.size + RECORD_HEADER_LEN + length > self.max_bytes :
+            self._rotate()
+        head = self._head
+        head[0] = delta & 0xFF
+        head[1] = delta >> 8
+        head[2] = length
+        self.file.write(head)
+        self.file.write(data[offset:offset+length] if offset or length != len(data) else data)
+        self.size += RECORD_HEADER_LEN + length
+        self.records += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class FrameReplayer() :
+
+    def __init__(self, path):
+        self.path = path
+
+    #fichiers dans l'ordre chronologique (.1 d'abord)
+    def _paths(self):
+        paths = []
+        for path in (self.path + '.1', self.path):
+            try :
+                os.stat(path)
+                paths.append(path)
+            except OSError :
+                pass
+        return paths
+
+    # rend (générateur) (écart en ms, trame) ; la trame est une memoryview
+    # sur un buffer réutilisé, valable jusqu'à la trame suivante
+    def frames(self):
+        buf = bytearray(256)
+        mv = memoryview(buf)
+        head = bytearray(RECORD_HEADER_LEN)
+        for path in self._paths():
+            with open(path, 'rb') as f :
+                if f.read(len(FILE_HEADER))[:4] != MAGIC :
+                    raise ValueError("%s is not an LD2410 recording" % path)
+                while True :
+                    if f.readinto(head) != RECORD_HEADER_LEN :
+                        break
+                    length = head[2]
+                    if f.readinto(mv[:length]) != length :
+                        break #dernière trame tronquée (coupure d'alimentation)
+                    yield head[0] | (head[1] << 8), mv[:length]
+
+    # repasse les trames par le décodeur et parse_report de sensor (un LD2410),
+    # en temps réel (speed = facteur d'accélération) ou au plus vite ;
+    # rend le nb de mesures décodées
+    def replay(self, sensor, realtime=False, speed=1.0):
+        count = 0
+        decoder = sensor.decoder
+        for delta, frame in self.frames():
+            if realtime and delta :
+                utime.sleep_ms(int(delta / speed))
+            decoder.write(frame)
+            i = decoder.next_frame()
+            while i >= 0 :
+                if decoder.buf[i] != 0xfd :
+                    count += sensor.parse_report(decoder.buf, i)
+                i = decoder.next_frame()
+        return count
@@ -0,0 +1,302 @@
+# HLK-LD2410 B et C  - simulateur logiciel du capteur (tests et mesures de charge sans matériel)
+# SimulatedLD2410 a l'interface UART utilisée par LD2410 (any, read, readinto,
+# write, set_baudrate) : il répond aux commandes 2.2.x par leurs trames ACK et
+# émet des rapports basic ou engineering à rate_hz, avec du bruit sur les
+# énergies et distances.
+#
+#   sim = SimulatedLD2410(rate_hz=10, noise=5)
+#   sensor = ld2410.LD2410(sim)
+#   sensor.enable_config()
+#
+# line_rate=True limite le débit à baudrate/10 octets par seconde (sinon les
+# octets sont disponibles immédiatement) ; clock peut être remplacée par une
+# horloge manuelle pour des tests reproductibles.
+import random
+import time
+
+import ld2410
+from ld2410 import HEADER, TERMINATOR, GATE_COUNT, ALL_GATES, BAUDRATES
+from ld2410_frames import build_ack, build_report
+
+FACTORY_MOTION_SENSITIVITY = [50, 50, 40, 30, 20, 15, 15, 15, 15]
+FACTORY_STANDSTILL_SENSITIVITY = [0, 0, 40, 40, 30, 30, 20, 20, 20]
+FIRMWARE = bytes([0x00, 0x00, 0x02, 0x01, 0x16, 0x24, 0x06, 0x22]) #type 0, V1.02.22062416
+
+
+def _word(data, k):
+    return data[k] | (data[k+1] << 8)
+
+
+def _long(data, k):
+    return data[k] | (data[k+1] << 8) | (data[k+2] << 16) | (data[k+3] << 24)
+
+
+class SimulatedLD2410() :
+
+    def __init__(self, rate_hz=10, noise=0, baudrate=256000, line_rate=False,
+                 ack_delay=0.0, error_rate=0.0, boot_time=0.5, clock=time.monotonic, seed=None):
+        self.rate_hz = rate_hz         #rapports par seconde
+        self.noise = noise             #amplitude du bruit (énergie en %, distance en cm)
+        self.baudrate = baudrate       #vitesse du module
+        self.host_baudrate = baudrate  #vitesse côté hôte (set_baudrate) : différente -> octets illisibles
+        self.line_rate = line_rate
+        self.ack_delay = ack_delay     #délai de réponse aux commandes (s)
+        self.error_rate = error_rate   #probabilité de corruption de chaque octet émis
+        self.boot_time = boot_time     #silence après reboot_module (s)
+        self.clock = clock
+        self.random = random.Random(seed)
+        #cible simulée (modifiable par le test)
+        self.state = ld2410.STATE_COMBINED_TARGET
+        self.moving_distance = 80
+        self.moving_energy = 60
+        self.stationary_distance = 120
+        self.stationary_energy = 40
+        self.detection_distance = 150
+        self.moving_gate_energy = [60, 40, 20, 10, 5, 5, 5, 5, 5]
+        self.stationary_gate_energy = [0, 40, 30, 10, 5, 5, 5, 5, 5]
+        self.light = 0
+        self.out_pin = 1
+        #état du module
+        self.factory_reset()
+        self.config_mode = False
+        self.engineering = False
+        self.mac = bytes([0x8f, 0x27, 0x2e, 0xb8, 0x0f, 0x65])
+        self.commands = 0          #nb de commandes reçues
+        self.reports = 0           #nb de rapports émis
+        self._rx = bytearray()     #octets écrits par l'hôte
+        self._tx = []              #(instant de disponibilité, octets) en attente
+        self._pending = bytearray() #octets disponibles en lecture
+        now = clock()
+        self._next_report = now
+        self._line_free = now
+        self._silent_until = now
+
+    def factory_reset(self):
+        self.config = ld2410.SensorConfig(8, 8, 5, list(FACTORY_MOTION_SENSITIVITY),
+                                          list(FACTORY_STANDSTILL_SENSITIVITY), 0x0000)
+        self.pending_baudrate = None
+        self.bluetooth = 1
+        self.password = b'HiLink'
+
+    #---------interface UART ----------
+    def any(self):
+        self._update()
+        return len(self._pending)
+
+    def read(self):
+        self._update()
+        if not self._pending :
+            return None
+        data = bytes(self._pending)
+        self._pending = bytearray()
+        return data
+
+    def readinto(self, buf):
+        self._update()
+        n = min(len(buf), len(self._pending))
+        if n == 0 :
+            return None
+        buf[:n] = self._pending[:n]
+        del self._pending[:n]
+        return n
+
+    def write(self, data):
+        if self.host_baudrate != self.baudrate :
+            return len(data) #vitesse différente : le module ne comprend rien
+        self._rx.extend(data)
+        self._parse_commands()
+        return len(data)
+
+    def set_baudrate(self, baudrate):
+        self.host_baudrate = baudrate
+
+    #---------émission ----------
+    def _send(self, data, at):
+        start = max(at, self._line_free)
+        if self.line_rate :
+            start += len(data) * 10 / self.baudrate
+        self._line_free = start
+        if self.error_rate or self.host_baudrate != self.baudrate :
+            data = bytearray(data)
+            for k in range(len(data)):
+                if self.host_baudrate != self.baudrate or self.random.random() < self.error_rate :
+                    data[k] = self.random.getrandbits(8)
+        self._tx.append((start, data))
+
+    def _noisy(self, value, high):
+        if self.noise :
+            value += self.random.randint(-self.noise, self.noise)
+        return min(max(value, 0), high)
+
+    def _report(self):
+        n = self._noisy
+        if self.engineering :
+            moving = [n(e, 100) for e in self.moving_gate_energy]
+            stationary = [n(e, 100) for e in self.stationary_gate_energy]
+        else :
+            moving = stationary = None
+        return build_report(self.state, n(self.moving_distance, 0xFFFF), n(self.moving_energy, 100),
+                            n(self.stationary_distance, 0xFFFF), n(self.stationary_energy, 100),
+                            n(self.detection_distance, 0xFFFF), moving, stationary, self.light, self.out_pin)
+
+    def _update(self):
+        now = self.clock()
+        if self.rate_hz and not self.config_mode and now >= self._silent_until :
+            period = 1 / self.rate_hz
+            if now - self._next_report > 1 : #hôte absent plus d'1 s : pas de rattrapage
+                self._next_report = now - 1
+            while self._next_report <= now :
+                self._send(self._report(), self._next_report)
+                self.reports += 1
+                self._next_report += period
+        if self._tx :
+            ready = 0
+            for at, data in self._tx :
+                if at > now :
+                    break
+                self._pending.extend(data)
+                ready += 1
+            del self._tx[:ready]
+
+    #---------commandes ----------
+    def _parse_commands(self):
+        rx = self._rx
+        while True :
+            start = rx.find(HEADER)
+            if start < 0 :
+                del rx[:max(0, len(rx) - 3)]
+                return
+            del rx[:start]
+            if len(rx) < 6 :
+                return
+            total = _word(rx, 4) + 10
+            if len(rx) < total :
+                return
+            frame = bytes(rx[:total])
+            del rx[:total]
+            if frame[-4:] == TERMINATOR :
+                self.commands += 1
+                response = self._command(_word(frame, 6), frame[8:-4])
+                if response is not None :
+                    self._send(build_ack(_word(frame, 6), *response), self.clock() + self.ack_delay)
+                    if _word(frame, 6) == 0x00A3 :
+                        self.reboot() #après l'ACK, émis à l'ancienne vitesse
+
+    #rend (statut, données) de l'ACK, None si le module ne répond pas
+    def _command(self, cmd, value):
+        config = self.config
+        if cmd == 0x00FF :
+            self.config_mode = True
+            return 0, b'\x01\x00\x40\x00' #version de protocole, taille de buffer
+        if not self.config_mode :
+            return None #hors mode configuration le module ignore les commandes
+        if cmd == 0x00FE :
+            self.config_mode = False
+            self._next_report = max(self._next_report, self.clock())
+        elif cmd == 0x0060 :
+            moving, stationary, duration = _long(value, 2), _long(value, 8), _long(value, 14)
+            if not (2 <= moving <= 8 and 2 <= stationary <= 8 and duration <= 0xFFFF) :
+                return 1, b''
+            config.max_moving_gate, config.max_stationary_gate, config.no_one_duration = moving, stationary, duration
+        elif cmd == 0x0061 :
+            return 0, bytes([0xaa, GATE_COUNT - 1, config.max_moving_gate, config.max_stationary_gate]) \
+                      + bytes(config.motion_sensitivity) + bytes(config.standstill_sensitivity) \
+                      + bytes([config.no_one_duration & 0xFF, config.no_one_duration >> 8])
+        elif cmd == 0x0062 or cmd == 0x0063 :
+            self.engineering = cmd == 0x0062
+        elif cmd == 0x0064 :
+            gate, motion, standstill = _long(value, 2), _long(value, 8), _long(value, 14)
+            if (gate >= GATE_COUNT and gate != ALL_GATES) or motion > 100 or standstill > 100 :
+                return 1, b''
+            for g in (range(GATE_COUNT) if gate == ALL_GATES else [gate]) :
+                config.motion_sensitivity[g] = motion
+                config.standstill_sensitivity[g] = standstill
+        elif cmd == 0x00A0 :
+            return 0, FIRMWARE
+        elif cmd == 0x00A1 :
+            if _word(value, 0) not in BAUDRATES :
+                return 1, b''
+            self.pending_baudrate = BAUDRATES[_word(value, 0)] #pris en compte au redémarrage
+        elif cmd == 0x00A2 :
+            self.factory_reset()
+        elif cmd == 0x00A3 :
+            pass #redémarrage après l'envoi de l'ACK (_parse_commands)
+        elif cmd == 0x00A4 :
+            self.bluetooth = _word(value, 0)
+        elif cmd == 0x00A5 :
+            return 0, self.mac
+        elif cmd == 0x00A8 :
+            return (0 if value == self.password else 1), b''
+        elif cmd == 0x00A9 :
+            self.password = bytes(value)
+        elif cmd == 0x00AA :
+            if _word(value, 0) > 1 :
+                return 1, b''
+            config.resolution = _word(value, 0)
+        elif cmd == 0x00AB :
+            return 0, bytes([config.resolution, 0x00])
+        else :
+            return 1, b''
+        return 0, b''
+
+    #redémarrage (après l'ACK) : sortie du mode configuration, nouvelle vitesse
+    def reboot(self):
+        self.config_mode = False
+        self.engineering = False
+        if self.pending_baudrate is not None :
+            self.baudrate = self.pending_baudrate
+            self.pending_baudrate = None
+        self._silent_until = self.clock() + self.ack_delay + self.boot_time
+        self._next_report = self._silent_until
+
+
+#----------- flux asyncio (AsyncLD2410) ------------
+# reader = writer = SimStream(sim) : AsyncLD2410(stream, stream)
+class SimStream() :
+
+    def __init__(self, sim, poll_s=0.001):
+        self.sim = sim
+        self.poll_s = poll_s
+
+    async def read(self, n):
+        try :
+            import asyncio
+        except ImportError :
+            import uasyncio as asyncio
+        buf = bytearray(n)
+        while True :
+            count = self.sim.readinto(buf)
+            if count :
+                return bytes(buf[:count])
+            await asyncio.sleep(self.poll_s)
+
+    def write(self, data):
+        return self.sim.write(data)
+
+    async def drain(self):
+        pass
+
+
+#----------- broche simulée (OUT du module) ------------
+# interface de machine.Pin utilisée par ld2410_wake : value() et irq()
+class SimulatedPin() :
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, value=0):
+        self._value = value
+        self._trigger = 0
+        self._handler = None
+
+    def value(self, value=None):
+        if value is None :
+            return self._value
+        edge = self.IRQ_RISING if value and not self._value else \
+               self.IRQ_FALLING if self._value and not value else 0
+        self._value = value
+        if edge & self._trigger and self._handler is not None :
+            self._handler(self)
+
+    def irq(self, trigger=IRQ_RISING | IRQ_FALLING, handler=None):
+        self._trigger = trigger
+        self._handler = handler
@@ -0,0 +1,192 @@
+# HLK-LD2410 B et C  - surveillance et récupération automatique du module
+# Un capteur bloqué (plus de trames, ou trames en erreur) est relancé par
+# étapes de plus en plus lourdes, chacune validée par l'arrivée d'une trame :
+#   0 resynchronisation du décodeur (vidange de l'UART)
+#   1 entrée / sortie du mode configuration (module resté en mode configuration)
+#   2 reboot_module, attente de la première trame, puis configuration en cache
+#     réappliquée (apply_config) et mode engineering rétabli s'il était actif
+# Si les trois étapes échouent, nouvel essai après un délai doublé à chaque
+# échec, avec un aléa de +-jitter pour qu'une flotte de capteurs ne se
+# relance pas en même temps.
+#
+#   supervisor = Supervisor(human_sensor)
+#   while True :
+#       if supervisor.poll() :         # read_reports() + surveillance
+#           detector.update(human_sensor.meas)
+#       print(supervisor.stats())      # nb de pannes, durée des récupérations...
+import random
+
+from ld2410 import utime
+
+STEP_NAMES = ["resync", "config", "reboot"]
+
+
+class Supervisor() :
+
+    # max_frame_age_ms : panne si aucune trame depuis cette durée
+    # max_error_rate : panne si la part de trames rejetées dépasse ce taux
+    #   (sur check_ms, avec au moins min_frames trames)
+    # verify_ms : attente d'une trame après les étapes 0 et 1, boot_ms après reboot
+    # backoff_ms / max_backoff_ms : délai entre deux cycles de récupération en échec
+    # callback(event, step, recovery_ms) : event = "stall", "recovered" ou "failed"
+    def __init__(self, sensor, max_frame_age_ms=3000, max_error_rate=0.5, min_frames=5, check_ms=1000,
+                 verify_ms=1500, boot_ms=5000, backoff_ms=1000, max_backoff_ms=60000, jitter=0.25,
+                 callback=None):
+        self.sensor = sensor
+        self.max_frame_age_ms = max_frame_age_ms
+        self.max_error_rate = max_error_rate
+        self.min_frames = min_frames
+        self.check_ms = check_ms
+        self.verify_ms = verify_ms
+        self.boot_ms = boot_ms
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.jitter = jitter
+        self.callback = callback
+        now = utime.ticks_ms()
+        self.stalled_since = None  #ticks_ms du début de la panne, None si tout va bien
+        self.reason = None         #"frame age" ou "error rate"
+        self.engineering = False   #mode engineering actif avant la panne
+        self._delay_ms = backoff_ms
+        self._next_attempt = now
+        self._check_at = now
+        self._last_ok = now        #référence si aucune trame n'a jamais été reçue
+        self._frames = sensor.stats_data.frames
+        self._rejected = 0
+        #compteurs exportés
+        self.stalls = 0
+        self.recoveries = 0
+        self.failures = 0
+        self.recovered_by = [0] * len(STEP_NAMES)
+        self.last_recovery_ms = None
+        self.max_recovery_ms = 0
+        self.total_recovery_ms = 0
+
+    def _rejected_count(self):
+        return sum(self.sensor.stats_data.rejected.values())
+
+    #lecture des trames puis surveillance, rend le nb de trames décodées
+    def poll(self, now_ms=None):
+        count = self.sensor.read_reports()
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        if count :
+            self._last_ok = now_ms
+            self.engineering = self.sensor.meas.engineering
+        if self.stalled_since is None :
+            if utime.ticks_diff(now_ms, self._check_at) >= 0 :
+                self._check(now_ms)
+        if self.stalled_since is not None and utime.ticks_diff(now_ms, self._next_attempt) >= 0 :
+            self.recover()
+        return count
+
+    def _check(self, now_ms):
+        self._check_at = utime.ticks_add(now_ms, self.check_ms)
+        stats = self.sensor.stats_data
+        frames = stats.frames - self._frames
+        rejected = self._rejected_count() - self._rejected
+        self._frames = stats.frames
+        self._rejected = self._rejected_count()
+        age = stats.meas_age_ms()
+        if age is None :
+            age = utime.ticks_diff(now_ms, self._last_ok)
+        if age > self.max_frame_age_ms :
+            self._stall(now_ms, "frame age")
+        elif frames + rejected >= self.min_frames and rejected > self.max_error_rate * (frames + rejected) :
+            self._stall(now_ms, "error rate")
+
+    def _stall(self, now_ms, reason):
+        self.stalled_since = now_ms
+        self.reason = reason
+        self.stalls += 1
+        #premier essai décalé lui aussi : des capteurs tombés ensemble
+        #(coupure d'alimentation, bus) ne repartent pas en même temps
+        self._delay_ms = self.backoff_ms
+        self._next_attempt = utime.ticks_add(now_ms, self._jittered(self._delay_ms))
+        self.sensor.communication_error = 1
+        print('supervisor : panne capteur,', reason)
+        if self.callback is not None :
+            self.callback("stall", None, None)
+
+    #attend une trame valide pendant timeout_ms (une trame rejetée, par ex.
+    #coupée par la sortie du mode configuration, ne fait pas échouer l'étape)
+    def _wait_frame(self, timeout_ms):
+        sensor = self.sensor
+        start = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), start) < timeout_ms :
+            if sensor.read_reports() :
+                return True
+            utime.sleep_ms(10)
+        return False
+
+    def _step(self, step):
+        sensor = self.sensor
+        if step == 0 :
+            sensor.decoder.reset()
+            if sensor.ser.any() > 0 :
+                sensor.serial_flush()
+            return self._wait_frame(self.verify_ms)
+        if step == 1 :
+            sensor.call("enable_config")
+            sensor.call("end_config")
+            return self._wait_frame(self.verify_ms)
+        sensor.call("enable_config")
+        sensor.reboot_module() #le module quitte seul le mode configuration : pas de end_config
+        if not self._wait_frame(self.boot_ms) :
+            return False
+        if sensor.config is not None :
+            sensor.apply_config(sensor.config, refresh=True)
+        if self.engineering :
+            sensor.enable_config()
+            sensor.enable_engineering_mode()
+            sensor.end_config()
+        return self._wait_frame(self.verify_ms)
+
+    #delay_ms +- jitter
+    def _jittered(self, delay_ms):
+        jitter = int(delay_ms * self.jitter)
+        return delay_ms + random.randint(-jitter, jitter)
+
+    # un cycle de récupération (étapes 0 à 2), rend 1 si le capteur est reparti
+    def recover(self):
+        for step in range(len(STEP_NAMES)):
+            print('supervisor : étape', STEP_NAMES[step])
+            if self._step(step) :
+                now = utime.ticks_ms()
+                recovery_ms = utime.ticks_diff(now, self.stalled_since)
+                self.recoveries += 1
+                self.recovered_by[step] += 1
+                self.last_recovery_ms = recovery_ms
+                self.max_recovery_ms = max(self.max_recovery_ms, recovery_ms)
+                self.total_recovery_ms += recovery_ms
+                self.stalled_since = None
+                self.sensor.communication_error = 0
+                self._last_ok = now
+                self._frames = self.sensor.stats_data.frames
+                self._rejected = self._rejected_count()
+                self._check_at = utime.ticks_add(now, self.check_ms)
+                print('supervisor : capteur reparti en', recovery_ms, 'ms')
+                if self.callback is not None :
+                    self.callback("recovered", STEP_NAMES[step], recovery_ms)
+                return 1
+        self.failures += 1
+        delay = self._jittered(self._delay_ms)
+        self._next_attempt = utime.ticks_add(utime.ticks_ms(), delay)
+        self._delay_ms = min(self._delay_ms * 2, self.max_backoff_ms)
+        print('supervisor : échec, nouvel essai dans', delay, 'ms')
+        if self.callback is not None :
+            self.callback("failed", None, None)
+        return 0
+
+    def stats(self):
+        return {
+            "stalled": self.stalled_since is not None,
+            "reason": self.reason,
+            "stalls": self.stalls,
+            "recoveries": self.recoveries,
+            "failures": self.failures,
+            "recovered_by": dict(zip(STEP_NAMES, self.recovered_by)),
+            "last_recovery_ms": self.last_recovery_ms,
+            "max_recovery_ms": self.max_recovery_ms,
+            "mean_recovery_ms": self.total_recovery_ms // self.recoveries if self.recoveries else None,
+            "backoff_ms": self._delay_ms}
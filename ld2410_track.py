@@ -0,0 +1,120 @@
+# HLK-LD2410 B et C  - suivi de la cible : distance lissée, vitesse, confiance
+# Les distances du module sont quantifiées par porte (75 cm, 20 cm après
+# distance_resolution_setting(0x0001)). Un filtre alpha-beta (mémoire et
+# travail constants par trame) lisse la distance et estime la vitesse :
+#
+#   tracker = AlphaBetaTracker(gate_cm=GATE_CM[0x0000])
+#   while True :
+#       if human_sensor.read_reports() and tracker.update(human_sensor.meas) :
+#           print(tracker.distance, tracker.velocity, tracker.confidence)
+#
+# distance en cm, velocity en cm/s (< 0 : la cible s'approche, > 0 : elle
+# s'éloigne), confidence entre 0 et 1 (énergie de la cible et cohérence avec
+# la prédiction, lissées). Fusion : avec cibles en mouvement et immobile, la
+# mesure est la moyenne des deux distances pondérée par leurs énergies.
+# Version par lots (rejeu sur PC) : ld2410_numpy.track_reports.
+import ld2410
+from ld2410 import utime
+
+#largeur d'une porte (cm) selon la résolution (2.2.16 / 2.2.17)
+GATE_CM = {0x0000: 75, 0x0001: 20}
+
+
+#mesure fusionnée (distance, énergie) de meas, (None, 0) sans cible assez énergique
+def fuse(meas, min_energy=0):
+    distance = None
+    energy = 0
+    if meas.state & ld2410.STATE_MOVING_TARGET and meas.moving_energy > min_energy :
+        distance = meas.moving_distance
+        energy = meas.moving_energy
+    if meas.state & ld2410.STATE_STATIONARY_TARGET and meas.stationary_energy > min_energy :
+        stationary_energy = meas.stationary_energy
+        if distance is None :
+            distance = meas.stationary_distance
+        else :
+            distance = (distance * energy + meas.stationary_distance * stationary_energy) / (energy + stationary_energy)
+        energy = max(energy, stationary_energy)
+    return distance, energy
+
+
+class AlphaBetaTracker() :
+
+    # alpha, beta : gains du filtre (alpha haut = suit vite, beta haut = vitesse réactive)
+    # gate_cm : largeur de porte, règle la tolérance aux écarts
+    # max_jump : écart (en portes) au-delà duquel une mesure est aberrante ;
+    #   après outliers mesures aberrantes de suite le suivi repart de la mesure
+    # max_gap_ms : suivi abandonné après cette durée sans cible
+    # smoothing : lissage de la confiance (0..1)
+    def __init__(self, alpha=0.4, beta=0.05, gate_cm=75, min_energy=0, max_jump=4, outliers=3,
+                 max_gap_ms=2000, smoothing=0.2):
+        self.alpha = alpha
+        self.beta = beta
+        self.gate_cm = gate_cm
+        self.min_energy = min_energy
+        self.max_jump = max_jump
+        self.outliers = outliers
+        self.max_gap_ms = max_gap_ms
+        self.smoothing = smoothing
+        self._last_ms = None
+        self.reset()
+
+    def reset(self):
+        self.distance = None  #distance lissée (cm), None sans suivi
+        self.velocity = 0.0   #cm/s
+        self.confidence = 0.0
+        self._missed_ms = 0   #durée sans mesure retenue
+        self._outliers = 0    #mesures aberrantes consécutives
+
+    @property
+    def tracking(self):
+        return self.distance is not None
+
+    @property
+    def approaching(self):
+        return self.velocity < 0
+
+    # une trame décodée ; rend True si une cible est suivie
+    def update(self, meas, now_ms=None):
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        dt_ms = 0 if self._last_ms is None else utime.ticks_diff(now_ms, self._last_ms)
+        self._last_ms = now_ms
+        distance, energy = fuse(meas, self.min_energy)
+        return self.step(distance, energy, dt_ms)
+
+    # une mesure fusionnée (distance None : pas de cible) dt_ms après la précédente
+    def step(self, distance, energy, dt_ms):
+        if self.distance is None :
+            if distance is None :
+                return False
+            self.distance = float(distance)
+            self.velocity = 0.0
+            self.confidence = self.smoothing * energy / 100
+            return True
+        dt = dt_ms / 1000
+        predicted = self.distance + self.velocity * dt
+        if distance is not None :
+            residual = distance - predicted
+            if abs(residual) > self.max_jump * self.gate_cm :
+                self._outliers += 1
+                if self._outliers >= self.outliers :
+                    #la cible a vraiment changé : on repart de la mesure
+                    self.reset()
+                    return self.step(distance, energy, dt_ms)
+                distance = None #mesure ignorée, traitée comme une absence
+        if distance is None :
+            self._missed_ms += dt_ms
+            if self._missed_ms > self.max_gap_ms :
+                self.reset()
+                return False
+            self.distance = max(predicted, 0.0)
+            self.confidence -= self.smoothing * self.confidence
+            return True
+        self._missed_ms = 0
+        self._outliers = 0
+        self.distance = max(predicted + self.alpha * residual, 0.0)
+        if dt > 0 :
+            self.velocity += self.beta * residual / dt
+        quality = energy / 100 * max(0.0, 1 - abs(residual) / (2 * self.gate_cm))
+        self.confidence += self.smoothing * (quality - self.confidence)
+        return True
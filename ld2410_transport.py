@@ -0,0 +1,116 @@
+# HLK-LD2410 B et C  - transports série
+# LD2410 n'utilise que any(), read(), readinto() et write() (interface de
+# machine.UART) : chaque transport ci-dessous fournit ces quatre méthodes,
+# plus set_baudrate() pour changer la vitesse côté hôte.
+#
+#   MicroPython : LD2410(UARTTransport(UART(1, baudrate=256000, tx=Pin(4), rx=Pin(5), timeout=1)))
+#   PC linux    : LD2410(SerialTransport("/dev/ttyUSB0"))      (module pyserial)
+#                 LD2410(FDTransport(os.open("/dev/pts/3", os.O_RDWR | os.O_NOCTTY)))
+
+
+#----------- MicroPython machine.UART ------------
+class UARTTransport() :
+
+    def __init__(self, uart, baudrate=256000, **init_args):
+        self.uart = uart
+        self.baudrate = baudrate
+        self.init_args = init_args #paramètres repassés à uart.init() (tx, rx, timeout...)
+
+    def any(self):
+        return self.uart.any()
+
+    def read(self):
+        return self.uart.read()
+
+    def readinto(self, buf):
+        return self.uart.readinto(buf)
+
+    def write(self, data):
+        return self.uart.write(data)
+
+    def set_baudrate(self, baudrate):
+        self.uart.init(baudrate=baudrate, **self.init_args)
+        self.baudrate = baudrate
+
+
+#----------- pySerial (PC, adaptateur USB-UART) ------------
+class SerialTransport() :
+
+    def __init__(self, port, baudrate=256000):
+        try :
+            import serial
+        except ImportError :
+            raise ImportError("SerialTransport needs the pyserial package")
+        self.serial = serial.Serial(port, baudrate, timeout=0)
+        self.port = port #clé du cache d'identité (ld2410.IDENTITY_CACHE)
+        self.baudrate = baudrate
+
+    def any(self):
+        return self.serial.in_waiting
+
+    def read(self):
+        n = self.serial.in_waiting
+        return self.serial.read(n) if n else None
+
+    def readinto(self, buf):
+        n = min(len(buf), self.serial.in_waiting)
+        if n == 0 :
+            return None
+        return self.serial.readinto(memoryview(buf)[:n])
+
+    def write(self, data):
+        return self.serial.write(data)
+
+    def set_baudrate(self, baudrate):
+        self.serial.baudrate = baudrate
+        self.baudrate = baudrate
+
+    def close(self):
+        self.serial.close()
+
+
+#----------- descripteur de fichier (pseudo-terminal, tty) ------------
+class FDTransport() :
+
+    def __init__(self, fd, baudrate=None):
+        import os
+        self._os = os
+        self.fd = fd
+        os.set_blocking(fd, False)
+        self.baudrate = None
+        if baudrate is not None :
+            self.set_baudrate(baudrate)
+
+    def any(self):
+        import fcntl, termios, struct
+        data = fcntl.ioctl(self.fd, termios.FIONREAD, b'\0\0\0\0')
+        return struct.unpack('i', data)[0]
+
+    def read(self):
+        try :
+            return self._os.read(self.fd, 4096) or None
+        except BlockingIOError :
+            return None
+
+    def readinto(self, buf):
+        try :
+            return self._os.readv(self.fd, [buf]) or None
+        except BlockingIOError :
+            return None
+
+    def write(self, data):
+        return self._os.write(self.fd, data)
+
+    #vitesses POSIX seulement (termios.B115200...), sans effet sur un pseudo-terminal
+    def set_baudrate(self, baudrate):
+        import termios
+        speed = getattr(termios, "B%d" % baudrate, None)
+        if speed is None :
+            raise ValueError("baudrate %d not supported by termios" % baudrate)
+        attrs = termios.tcgetattr(self.fd)
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+        self.baudrate = baudrate
+
+    def close(self):
+        self._os.close(self.fd)
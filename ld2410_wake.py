@@ -0,0 +1,68 @@
+# HLK-LD2410 B et C  - réveil par la broche OUT (faible consommation)
+# Le module met OUT à 1 tant qu'une présence est détectée. Pendant les longues
+# périodes vides l'UART n'est pas lue : une interruption sur OUT réveille la
+# lecture des trames, qui s'arrête dès que OUT retombe (le module ne la fait
+# retomber qu'après sa durée d'absence, no_one_duration de 2.2.3 : inutile
+# d'attendre plus, seul un court anti-rebond debounce_ms est appliqué).
+#
+#   out = Pin(6, Pin.IN)
+#   wake = OutPinWakeup(human_sensor, out)
+#   wake.arm()
+#   while True :
+#       wake.poll()
+#       if wake.idle :
+#           machine.lightsleep(100)   # ou toute autre tâche
+#
+# pin doit fournir value() et irq(trigger=, handler=) comme machine.Pin
+# (ld2410_sim.SimulatedPin sur PC).
+from ld2410 import utime
+
+
+class OutPinWakeup() :
+
+    def __init__(self, sensor, pin, debounce_ms=50):
+        self.sensor = sensor
+        self.pin = pin
+        self.debounce_ms = debounce_ms #OUT doit rester à 0 ce temps avant la mise en veille
+        self.reading = False   #lecture UART en cours
+        self.wakeups = 0       #nb de réveils
+        self._edge = False     #front vu par l'interruption
+        self._last_high = 0    #ticks_ms du dernier OUT à 1
+
+    @property
+    def idle(self):
+        return not self.reading
+
+    def arm(self):
+        trigger = getattr(self.pin, "IRQ_RISING", 1) | getattr(self.pin, "IRQ_FALLING", 2)
+        self.pin.irq(trigger=trigger, handler=self._irq)
+
+    def disarm(self):
+        self.pin.irq(handler=None)
+
+    #interruption : pas d'allocation, le travail est fait dans poll()
+    def _irq(self, pin):
+        self._edge = True
+
+    #à appeler dans la boucle principale, rend le nb de trames décodées
+    def poll(self, now_ms=None):
+        if not self._edge and not self.reading :
+            return 0 #vide : ni UART ni décodage
+        self._edge = False
+        if now_ms is None :
+            now_ms = utime.ticks_ms()
+        if self.pin.value() :
+            self._last_high = now_ms
+            if not self.reading :
+                #octets accumulés pendant la veille : périmés
+                self.sensor.decoder.reset()
+                if self.sensor.ser.any() > 0 :
+                    self.sensor.serial_flush()
+                self.reading = True
+                self.wakeups += 1
+        elif self.reading and utime.ticks_diff(now_ms, self._last_high) >= self.debounce_ms :
+            self.reading = False
+            return 0
+        if not self.reading :
+            return 0
+        return self.sensor.read_reports()
@@ -18,6 +18,11 @@ uart1 = UART(1, baudrate = 256000, tx=Pin(4), rx=Pin(5), timeout = 1)
 print(uart1)
 
 human_sensor = ld2410.LD2410(uart1)
+#vitesse du module inconnue : détection automatique (ld2410_baud, transport avec set_baudrate)
+#from ld2410_transport import UARTTransport
+#from ld2410_baud import probe_baudrate
+#human_sensor = ld2410.LD2410(UARTTransport(uart1, tx=Pin(4), rx=Pin(5), timeout = 1))
+#probe_baudrate(human_sensor, path="ld2410.baud")
 print('----------------------------------------')
 human_sensor.enable_config()
 human_sensor.Maximum_distance_gate_and_unoccupied_duration_parameters_configuration(2,2,50) # 2-->8,2-->8,0-->65535 
@@ -33,15 +38,32 @@ human_sensor.distance_gate_sensitivity_configuration(1,4,4)
 human_sensor.distance_resolution_setting(0x0000)
 #human_sensor.query_distance_resolution_setting()
 human_sensor.end_config()
+#configuration groupée équivalente : une seule session, seules les valeurs qui changent sont envoyées
+#human_sensor.apply_config(ld2410.SensorConfig(max_moving_gate=2, max_stationary_gate=2, no_one_duration=50, resolution=0x0000))
 
 #human_sensor.enable_engineering_mode()
 #human_sensor.end_engineering_mode()
 
 utime.sleep(5) #debug pour lire les rapports de configuration
 
+#surveillance, détection et suivi (boucle ci-dessous)
+#from ld2410_supervisor import Supervisor
+#from ld2410_detect import PresenceDetector
+#from ld2410_track import AlphaBetaTracker
+#supervisor = Supervisor(human_sensor)
+#detector = PresenceDetector()
+#tracker = AlphaBetaTracker()
+
 print('-----------DECTECTION----------------')
 while True: 
     human_sensor.send_command_report_data()
+    #human_sensor.read_reports() #lecture continue de toutes les trames recues (~10 Hz) 
+    #lecture continue avec relance automatique du module en panne (ld2410_supervisor) :
+    #supervisor.poll()
+    #detection sur chaque trame avec hystérésis (ld2410_detect) :
+    #if human_sensor.read_reports() : detector.update(human_sensor.meas)
+    #distance lissée et vitesse (ld2410_track) :
+    #if human_sensor.read_reports() and tracker.update(human_sensor.meas) : print(tracker.distance, tracker.velocity)
     #human_sensor.print_meas()
     human_sensor.human_detection(boardled,50,50)
     utime.sleep(3)
@@ -0,0 +1,97 @@
+# AsyncLD2410 contre le simulateur (SimStream), sous asyncio CPython
+import asyncio
+
+import ld2410
+from ld2410_async import AsyncLD2410
+from ld2410_sim import SimulatedLD2410, SimStream
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def make(**sim_args):
+    sim = SimulatedLD2410(**sim_args)
+    stream = SimStream(sim)
+    return sim, AsyncLD2410(stream, stream, ack_timeout_ms=200)
+
+
+def test_measurements_are_streamed():
+    sim, sensor = make(rate_hz=100)
+    async def main():
+        sensor.start()
+        count = 0
+        async for meas in sensor :
+            count += 1
+            if count == 5 :
+                break
+        sensor.stop()
+        return meas
+    meas = run(main())
+    assert meas.state == sim.state
+    assert meas.moving_distance == sim.moving_distance
+    assert meas.detection_distance == sim.detection_distance
+    assert sensor.stats()["frames"] >= 5
+
+
+def test_commands_await_their_ack():
+    sim, sensor = make(rate_hz=100)
+    async def main():
+        sensor.start()
+        assert await sensor.enable_config() == 1
+        assert sim.config_mode
+        config = await sensor.read_parameter()
+        firmware = await sensor.read_firmware_version()
+        assert await sensor.end_config() == 1
+        sensor.stop()
+        return config, firmware
+    config, firmware = run(main())
+    assert config.motion_sensitivity == sim.config.motion_sensitivity
+    assert firmware == "V1.02.22062416"
+    assert not sim.config_mode
+
+
+#hors mode configuration le module ignore read_parameter : pas d'ACK, et les
+#rapports continuent d'être lus pendant l'attente
+def test_missing_ack_times_out_without_blocking_the_reader():
+    sim, sensor = make(rate_hz=100)
+    async def main():
+        sensor.start()
+        await asyncio.sleep(0.05)
+        before = sensor.stats_data.frames
+        result = await sensor.call("read_parameter", timeout_ms=200)
+        during = sensor.stats_data.frames - before
+        sensor.stop()
+        return result, during
+    result, during = run(main())
+    assert not result.ok
+    assert result.status == ld2410.STATUS_TIMEOUT
+    assert sensor.stats()["commands"][0x0061]["timeouts"] == 1
+    assert during >= 5 #~20 trames à 100 Hz pendant les 200 ms d'attente
+
+
+def test_concurrent_commands_are_serialised():
+    sim, sensor = make(rate_hz=100, ack_delay=0.02)
+    async def main():
+        sensor.start()
+        await sensor.enable_config()
+        results = await asyncio.gather(sensor.call("read_parameter"), sensor.call("get_mac_address"),
+                                       sensor.call("query_distance_resolution_setting"))
+        await sensor.end_config()
+        sensor.stop()
+        return results
+    config, mac, resolution = run(main())
+    assert config.ok and mac.ok and resolution.ok
+    assert mac.values["mac"] == sim.mac
+
+
+def test_end_of_stream_stops_the_iterator():
+    class Closed() :
+        async def read(self, n):
+            return b''
+    sensor = AsyncLD2410(Closed(), None)
+    async def main():
+        sensor.start()
+        return [meas async for meas in sensor]
+    assert run(main()) == []
+    assert sensor.communication_error == 1
@@ -0,0 +1,102 @@
+# ld2410_baud.probe_baudrate / negotiate_baudrate : vitesses hôte et module
+# différentes dans le simulateur, sur une horloge simulée partagée avec utime
+import pytest
+
+import ld2410
+from ld2410_baud import negotiate_baudrate, probe_baudrate
+from ld2410_sim import SimulatedLD2410
+
+
+class Clock() :
+
+    def __init__(self):
+        self.ms = 0
+
+    def ticks_ms(self):
+        return self.ms
+
+    def sleep_ms(self, ms):
+        self.ms += ms
+
+    def seconds(self):
+        return self.ms / 1000
+
+
+#liaison qui perd des octets au-dessus de max_clean_baudrate (câble long)
+class LongCableLD2410(SimulatedLD2410) :
+
+    max_clean_baudrate = 115200
+
+    def _send(self, data, at):
+        self.error_rate = 0.05 if self.baudrate > self.max_clean_baudrate else 0.0
+        SimulatedLD2410._send(self, data, at)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ld2410.utime, "ticks_ms", clock.ticks_ms)
+    monkeypatch.setattr(ld2410.utime, "sleep_ms", clock.sleep_ms)
+    return clock
+
+
+#capteur dont l'hôte démarre à 256000, sim.tried : vitesses essayées côté hôte
+def sensor_on(sim):
+    sim.tried = []
+    set_baudrate = sim.set_baudrate
+    def tried(baudrate):
+        sim.tried.append(baudrate)
+        set_baudrate(baudrate)
+    sim.set_baudrate = tried
+    return ld2410.LD2410(sim)
+
+
+def test_probe_finds_the_module_baudrate_and_remembers_it(clock, tmp_path):
+    sim = SimulatedLD2410(baudrate=57600, clock=clock.seconds)
+    sim.host_baudrate = 256000
+    sensor = sensor_on(sim)
+    path = str(tmp_path / "ld2410.baud")
+    assert probe_baudrate(sensor, path=path) == 57600
+    assert sim.tried == [256000, 460800, 230400, 115200, 57600]
+    assert sim.host_baudrate == 57600 and not sim.config_mode
+    assert sensor.communication_error == 0
+    with open(path) as f :
+        assert f.read() == "57600"
+    sim.tried.clear()
+    assert probe_baudrate(sensor, path=path) == 57600
+    assert sim.tried == [57600] #vitesse enregistrée essayée en premier
+
+
+def test_probe_fails_when_no_candidate_answers(clock):
+    sim = SimulatedLD2410(baudrate=9600, clock=clock.seconds)
+    sensor = sensor_on(sim)
+    assert probe_baudrate(sensor, candidates=[256000, 115200]) == 0
+    assert sim.tried == [256000, 115200]
+    assert sensor.communication_error == 1
+
+
+def test_negotiate_keeps_the_fastest_clean_baudrate(clock, tmp_path):
+    sim = LongCableLD2410(baudrate=256000, boot_time=0.2, clock=clock.seconds, seed=1)
+    sensor = sensor_on(sim)
+    path = str(tmp_path / "ld2410.baud")
+    baudrate = negotiate_baudrate(sensor, candidates=[256000, 115200, 57600], boot_ms=500, path=path)
+    assert baudrate == 115200
+    assert sim.baudrate == sim.host_baudrate == 115200 #module et hôte passés à 115200
+    assert sensor.communication_error == 0
+    with open(path) as f :
+        assert f.read() == "115200"
+    assert probe_baudrate(sensor, path=path) == 115200
+
+
+def test_negotiate_starts_from_any_module_baudrate(clock):
+    sim = SimulatedLD2410(baudrate=9600, boot_time=0.2, clock=clock.seconds)
+    sensor = sensor_on(sim)
+    assert negotiate_baudrate(sensor, candidates=[256000, 115200], boot_ms=500) == 256000
+    assert sim.baudrate == sim.host_baudrate == 256000
+
+
+def test_negotiate_fails_without_answer(clock):
+    sim = SimulatedLD2410(baudrate=14400, clock=clock.seconds) #vitesse hors 2.2.9
+    sensor = sensor_on(sim)
+    assert negotiate_baudrate(sensor, candidates=[256000, 115200]) == 0
+    assert sim.baudrate == 14400 and sensor.communication_error == 1
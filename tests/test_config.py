@@ -0,0 +1,187 @@
+# LD2410.apply_config / _config_commands contre le simulateur
+import pytest
+
+import ld2410
+from ld2410_sim import SimulatedLD2410
+
+GATES = "Maximum_distance_gate_and_unoccupied_duration_parameters_configuration"
+SENSITIVITY = "distance_gate_sensitivity_configuration"
+
+
+#capteur sur simulateur, sim.sent : codes des commandes reçues par le module
+@pytest.fixture
+def sensor(monkeypatch):
+    ld2410.IDENTITY_CACHE.clear()
+    sim = SimulatedLD2410(rate_hz=0)
+    sim.sent = []
+    command = sim._command
+    def logged(cmd, value):
+        sim.sent.append(cmd)
+        return command(cmd, value)
+    monkeypatch.setattr(sim, "_command", logged)
+    yield ld2410.LD2410(sim)
+    ld2410.IDENTITY_CACHE.clear()
+
+
+#configuration complète (résolution comprise) lue et mise en cache
+def read_config(sensor):
+    sensor.enable_config()
+    config = sensor._read_config()
+    sensor.end_config()
+    sensor.ser.sent.clear()
+    return config.copy()
+
+
+def test_apply_config_without_change_sends_only_the_session(sensor):
+    sim = sensor.ser
+    assert sensor.apply_config(sim.config.copy()) == []
+    assert sim.sent == [0x00FF, 0x0061, 0x00AB, 0x00FE] #cache vide : relecture
+    sim.sent.clear()
+    assert sensor.apply_config(ld2410.SensorConfig(max_moving_gate=8)) == []
+    assert sim.sent == [0x00FF, 0x00FE]
+
+
+def test_apply_config_sends_only_the_differences(sensor):
+    sim = sensor.ser
+    motion = list(sim.config.motion_sensitivity)
+    motion[2] = 70
+    report = sensor.apply_config(ld2410.SensorConfig(max_moving_gate=6, motion_sensitivity=motion, resolution=0))
+    assert report == [(GATES, True), (SENSITIVITY, True)]
+    assert sim.sent == [0x00FF, 0x0061, 0x00AB, 0x0060, 0x0064, 0x00FE]
+    assert (sim.config.max_moving_gate, sim.config.max_stationary_gate) == (6, 8)
+    assert sim.config.motion_sensitivity[2] == 70
+    assert sensor.config == sim.config
+
+
+def test_equal_sensitivities_are_merged_into_all_gates(sensor):
+    sim = sensor.ser
+    config = read_config(sensor)
+    desired = ld2410.SensorConfig(motion_sensitivity=[40] * ld2410.GATE_COUNT,
+                                  standstill_sensitivity=[30] * ld2410.GATE_COUNT)
+    commands = sensor._config_commands(config, desired)
+    assert [(name, tuple(args)) for name, args, undo in commands] == [(SENSITIVITY, (ld2410.ALL_GATES, 40, 30))]
+    assert len(commands[0][2]) == ld2410.GATE_COUNT #annulation porte par porte
+    assert sensor.apply_config(desired) == [(SENSITIVITY, True)]
+    assert sim.config.motion_sensitivity == [40] * ld2410.GATE_COUNT
+    assert sim.config.standstill_sensitivity == [30] * ld2410.GATE_COUNT
+    #une seule porte à changer : pas de fusion même si toutes les valeurs deviennent égales
+    config = sensor.config.copy()
+    config.standstill_sensitivity[-1] = 20
+    commands = sensor._config_commands(config, desired)
+    assert [tuple(args) for name, args, undo in commands] == [(ld2410.GATE_COUNT - 1, 40, 30)]
+
+
+def test_apply_config_accepts_tuples(sensor):
+    sim = sensor.ser
+    motion = tuple(range(60, 60 + ld2410.GATE_COUNT))
+    report = sensor.apply_config(ld2410.SensorConfig(motion_sensitivity=motion))
+    assert report == [(SENSITIVITY, True)] * ld2410.GATE_COUNT
+    assert sim.config.motion_sensitivity == list(motion)
+    assert isinstance(sensor.config.motion_sensitivity, list)
+    sim.sent.clear()
+    assert sensor.apply_config(ld2410.SensorConfig(motion_sensitivity=motion)) == []
+    assert sim.sent == [0x00FF, 0x00FE]
+
+
+def test_partial_failure_is_rolled_back(sensor):
+    sim = sensor.ser
+    before = read_config(sensor)
+    motion = list(before.motion_sensitivity)
+    motion[3] = 60
+    motion[5] = 150 #refusé par le module
+    report = sensor.apply_config(ld2410.SensorConfig(max_moving_gate=4, motion_sensitivity=motion))
+    assert report == [(GATES, True), (SENSITIVITY, True), (SENSITIVITY, False)]
+    assert sim.config == before
+    assert sensor.config == before
+    assert not sim.config_mode
+
+
+def test_partial_failure_without_rollback_drops_the_cache(sensor):
+    sim = sensor.ser
+    motion = list(sim.config.motion_sensitivity)
+    motion[5] = 150
+    report = sensor.apply_config(ld2410.SensorConfig(max_moving_gate=4, motion_sensitivity=motion), rollback=False)
+    assert report == [(GATES, True), (SENSITIVITY, False)]
+    assert sim.config.max_moving_gate == 4
+    assert sensor.config is None #état partiel inconnu
+
+
+def test_failed_rollback_is_reported(sensor, monkeypatch):
+    sim = sensor.ser
+    read_config(sensor)
+    command = sim._command
+    def refuse_undo(cmd, value):
+        if cmd == 0x0060 and 0x0060 in sim.sent :
+            return 1, b'' #annulation refusée
+        return command(cmd, value)
+    monkeypatch.setattr(sim, "_command", refuse_undo)
+    motion = list(sim.config.motion_sensitivity)
+    motion[5] = 150
+    report = sensor.apply_config(ld2410.SensorConfig(max_moving_gate=4, motion_sensitivity=motion))
+    assert report == [(GATES, True), (SENSITIVITY, False), ("rollback " + GATES, False)]
+    assert sim.config.max_moving_gate == 4 #ni l'ancienne ni la nouvelle configuration
+    assert sensor.config is None
+
+
+#---------cache de configuration (read_parameter, setters, verify_config) ----------
+def test_cached_read_parameter_sends_nothing(sensor):
+    sim = sensor.ser
+    sensor.enable_config()
+    config = sensor.read_parameter()
+    assert sim.sent == [0x00FF, 0x0061]
+    commands = sim.commands
+    cached = sensor.read_parameter()
+    assert sim.commands == commands #aucune commande UART
+    assert cached == config
+    cached.motion_sensitivity[0] = 0 #copie : le cache n'est pas modifié
+    assert sensor.read_parameter().motion_sensitivity[0] == sim.config.motion_sensitivity[0]
+    sensor.read_parameter(refresh=True)
+    assert sim.commands == commands + 1
+    sensor.end_config()
+
+
+def test_setters_update_the_cache(sensor):
+    sim = sensor.ser
+    read_config(sensor)
+    sensor.enable_config()
+    sensor.Maximum_distance_gate_and_unoccupied_duration_parameters_configuration(5, 6, 30)
+    sensor.distance_gate_sensitivity_configuration(2, 70, 60)
+    sensor.distance_gate_sensitivity_configuration(ld2410.ALL_GATES, 45, 35)
+    sensor.distance_gate_sensitivity_configuration(4, 80, 20)
+    sensor.distance_resolution_setting(0x0001)
+    sensor.end_config()
+    assert sensor.config == sim.config
+    assert (sensor.config.max_moving_gate, sensor.config.no_one_duration, sensor.config.resolution) == (5, 30, 1)
+    assert sensor.config.motion_sensitivity[4] == 80 and sensor.config.motion_sensitivity[2] == 45
+    commands = sim.commands
+    assert sensor.read_parameter() == sim.config
+    assert sim.commands == commands
+    #commande refusée par le module : cache inchangé
+    sensor.enable_config()
+    assert sensor.distance_gate_sensitivity_configuration(3, 150, 20) == 0
+    sensor.end_config()
+    assert sensor.config == sim.config
+
+
+def test_restore_factory_settings_drops_the_cache(sensor):
+    sim = sensor.ser
+    read_config(sensor)
+    sensor.apply_config(ld2410.SensorConfig(max_moving_gate=3))
+    sensor.enable_config()
+    assert sensor.restore_factory_settings() == 1
+    assert sensor.config is None
+    sim.sent.clear()
+    assert sensor.read_parameter().max_moving_gate == 8 #relu sur le module
+    assert sim.sent == [0x0061]
+    sensor.end_config()
+
+
+def test_verify_config_detects_a_mismatch(sensor):
+    sim = sensor.ser
+    read_config(sensor)
+    assert sensor.verify_config() == 1
+    sim.config.motion_sensitivity[6] = 90 #modifié hors de ce driver (bluetooth, autre hôte)
+    assert sensor.read_parameter().motion_sensitivity[6] != 90 #cache périmé
+    assert sensor.verify_config() == 0
+    assert sensor.config == sim.config #cache remplacé par la lecture
+    assert sensor.verify_config() == 1
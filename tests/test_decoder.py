@@ -0,0 +1,55 @@
+# ReportDecoder / read_reports sur le flux rejouable ld2410_frames.capture_stream
+import pytest
+
+import ld2410
+from ld2410_frames import capture_stream
+
+
+#UART qui rend data par morceaux de chunk octets
+class ChunkUART() :
+
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+        self.pos = 0
+
+    def any(self):
+        return len(self.data) - self.pos
+
+    def readinto(self, buf):
+        n = min(len(buf), self.chunk, len(self.data) - self.pos)
+        if n <= 0 :
+            return None
+        buf[:n] = self.data[self.pos:self.pos+n]
+        self.pos += n
+        return n
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 7, 13, 64, 4096])
+def test_feed_finds_every_report_across_chunk_splits(chunk):
+    data, reports = capture_stream()
+    decoder = ld2410.ReportDecoder()
+    frames = []
+    for pos in range(0, len(data), chunk):
+        frames += list(decoder.feed(data[pos:pos+chunk]))
+    assert frames == reports
+    assert decoder.resync > 0 #parasites, trames coupées et ACK ignorés
+
+
+def test_feed_with_acks_returns_ack_frames():
+    data, reports = capture_stream()
+    frames = list(ld2410.ReportDecoder(acks=True).feed(data))
+    acks = [frame for frame in frames if frame[0] == 0xfd]
+    assert len(acks) == 3
+    assert [frame for frame in frames if frame[0] == 0xf4] == reports
+
+
+@pytest.mark.parametrize("chunk", [5, 64])
+def test_read_reports_decodes_the_stream(chunk):
+    data, reports = capture_stream()
+    sensor = ld2410.LD2410(ChunkUART(data, chunk))
+    while sensor.ser.any() :
+        sensor.read_reports()
+    assert sensor.stats_data.frames == len(reports)
+    assert sensor.meas.engineering == (reports[-1][6] == 0x01)
+    assert sensor.meas.moving_distance == reports[-1][9] | (reports[-1][10] << 8)
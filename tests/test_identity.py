@@ -0,0 +1,71 @@
+# LD2410.identify et IDENTITY_CACHE contre le simulateur
+import json
+
+import pytest
+
+import ld2410
+from ld2410_sim import SimulatedLD2410
+
+
+@pytest.fixture
+def sensor():
+    ld2410.IDENTITY_CACHE.clear()
+    sim = SimulatedLD2410(rate_hz=0)
+    yield ld2410.LD2410(sim, port="/dev/ttyUSB0")
+    ld2410.IDENTITY_CACHE.clear()
+
+
+def test_identify_reads_everything_in_one_session(sensor):
+    identity = sensor.identify()
+    assert identity.firmware == "V1.02.22062416"
+    assert identity.mac == sensor.ser.mac
+    assert identity.config == sensor.ser.config
+    commands = sensor.ser.commands
+    assert sensor.identify() is identity
+    assert sensor.ser.commands == commands #cache : aucun échange UART
+
+
+def test_cached_identity_follows_configuration_changes(sensor, tmp_path):
+    sensor.identify()
+    sensor.apply_config(ld2410.SensorConfig(max_moving_gate=3, resolution=1))
+    sensor.enable_config()
+    sensor.distance_gate_sensitivity_configuration(4, 70, 60)
+    sensor.end_config()
+    config = sensor.identify().config
+    assert config == sensor.ser.config
+    assert (config.max_moving_gate, config.resolution, config.motion_sensitivity[4]) == (3, 1, 70)
+    path = str(tmp_path / "identities.json")
+    ld2410.save_identities(path)
+    ld2410.IDENTITY_CACHE.clear()
+    assert ld2410.load_identities(path) == 1
+    assert ld2410.IDENTITY_CACHE["/dev/ttyUSB0"].config == sensor.ser.config
+    with open(path) as f :
+        assert json.load(f)[0]["mac"] == "8f:27:2e:b8:0f:65"
+
+
+def test_verify_config_refreshes_the_cached_identity(sensor):
+    sensor.identify()
+    sensor.ser.config.no_one_duration = 42 #changé hors du pilote (bluetooth...)
+    assert sensor.verify_config() == 0
+    assert sensor.identify().config.no_one_duration == 42
+
+
+def test_factory_reset_and_reboot_invalidate_the_cache(sensor):
+    sensor.identify()
+    sensor.enable_config()
+    sensor.restore_factory_settings()
+    assert "/dev/ttyUSB0" not in ld2410.IDENTITY_CACHE
+    sensor.identify()
+    sensor.enable_config()
+    sensor.reboot_module()
+    assert "/dev/ttyUSB0" not in ld2410.IDENTITY_CACHE
+
+
+def test_sensors_without_port_are_not_cached():
+    ld2410.IDENTITY_CACHE.clear()
+    first = ld2410.LD2410(SimulatedLD2410(rate_hz=0))
+    second = ld2410.LD2410(SimulatedLD2410(rate_hz=0))
+    second.ser.mac = bytes([1, 2, 3, 4, 5, 6])
+    identities = ld2410.identify_all([first, second])
+    assert identities[first].mac != identities[second].mac
+    assert ld2410.IDENTITY_CACHE == {}
@@ -0,0 +1,66 @@
+# SensorManager sur plusieurs capteurs simulés (SimStream)
+import asyncio
+
+from ld2410_async import AsyncLD2410
+from ld2410_manager import SensorManager
+from ld2410_sim import SimulatedLD2410, SimStream
+
+
+def make(count, rate_hz=200, queue_size=4096):
+    manager = SensorManager(queue_size)
+    for k in range(count):
+        sim = SimulatedLD2410(rate_hz=rate_hz)
+        sim.moving_distance = 100 + k
+        stream = SimStream(sim)
+        manager.add(k, AsyncLD2410(stream, stream, manager.ack_timeout_ms))
+    return manager
+
+
+def drain(queue):
+    items = []
+    while not queue.empty() :
+        items.append(queue.get_nowait())
+    return items
+
+
+#plusieurs trames par lecture de 64 octets : toutes doivent arriver dans le flux
+def test_every_decoded_frame_is_forwarded():
+    manager = make(8)
+    async def main():
+        manager.start()
+        await asyncio.sleep(0.5)
+        manager.stop()
+        return drain(manager.queue)
+    items = asyncio.run(main())
+    health = manager.health()
+    for k in range(8):
+        frames = [meas for t, sensor_id, meas in items if sensor_id == k]
+        assert len(frames) == health[k]["frames"] == manager.sensors[k].stats_data.frames
+        assert len(frames) > 20
+        assert all(meas.moving_distance == 100 + k for meas in frames) #copies, pas la mesure partagée
+    assert manager.dropped == 0
+
+
+def test_full_queue_drops_the_oldest():
+    manager = make(2, queue_size=10)
+    async def main():
+        manager.start()
+        await asyncio.sleep(0.2)
+        manager.stop()
+        return drain(manager.queue)
+    items = asyncio.run(main())
+    frames = sum(health["frames"] for health in manager.health().values())
+    assert len(items) == 10
+    assert manager.dropped == frames - 10
+
+
+def test_run_all_configures_every_sensor():
+    manager = make(4)
+    async def main():
+        manager.start()
+        results = await manager.run_all(AsyncLD2410.call, "enable_config")
+        await manager.run_all(AsyncLD2410.call, "end_config")
+        manager.stop()
+        return results
+    results = asyncio.run(main())
+    assert all(result.ok for result in results.values())
@@ -0,0 +1,53 @@
+# ld2410_numpy.decode_recording sur un enregistrement ld2410_record
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import ld2410_numpy
+from ld2410_frames import build_ack, build_report, capture_stream
+from ld2410_record import FrameRecorder
+
+
+#enregistre frames (trame, instant en ms) dans path
+def record(path, frames):
+    recorder = FrameRecorder(str(path), 1 << 20)
+    for frame, now_ms in frames :
+        recorder.record(frame, 0, len(frame), now_ms)
+    recorder.close()
+
+
+def test_recording_times_count_every_record(tmp_path):
+    good = build_report(0x01, 120, 50, 0, 0, 120)
+    bad = bytearray(good)
+    bad[7] = 0x55 #tête invalide : enregistrée mais pas décodée
+    fake = b'\xf4\xf3\xf2\xf1' + good #fausse trame à l'intérieur d'un enregistrement
+    path = tmp_path / "rec.bin"
+    record(path, [(good, 1000), (build_ack(0x0061), 1100), (bytes(bad), 1250),
+                  (b'\x01\x02\x03', 1300), (fake, 1400), (good, 71500), (good, 71600)])
+    times, reports = ld2410_numpy.decode_recording(str(path))
+    assert list(times) == [0, 400 + 65535, 400 + 65535 + 100] #ACK et trames invalides comptés, écart saturé
+    assert list(reports["moving_distance"]) == [120, 120, 120]
+
+
+def test_recording_matches_decode_frames(tmp_path):
+    data, frames = capture_stream(frames=400)
+    path = tmp_path / "rec.bin"
+    record(path, [(frame, 100 * k) for k, frame in enumerate(frames)])
+    with open(str(path), "ab") as f :
+        f.write(b'\x64\x00\x30\xf4\xf3') #dernière trame tronquée
+    times, reports = ld2410_numpy.decode_recording(str(path))
+    expected = ld2410_numpy.decode_frames(data)
+    assert list(times) == [100 * k for k in range(len(frames))]
+    for name in ("state", "moving_distance", "detection_distance", "moving_gate_energy", "out_pin") :
+        assert np.array_equal(reports[name], expected[name])
+
+
+def test_recordings_are_chained(tmp_path):
+    report = build_report(0x02, 80, 10, 80, 20, 80)
+    first = tmp_path / "a.bin"
+    second = tmp_path / "b.bin"
+    record(first, [(report, 0), (report, 500)])
+    record(second, [(report, 9000), (report, 9250)])
+    times, reports = ld2410_numpy.decode_recording(str(first), str(second))
+    assert list(times) == [0, 500, 500, 750]
+    assert len(reports) == 4
@@ -0,0 +1,168 @@
+# chaîne de publication : file bornée, codage delta, puits fichier / MQTT / HTTP
+import asyncio
+import json
+
+import ld2410
+from ld2410_publish import (MessageQueue, DeltaEncoder, Publisher, FileSink, MQTTSink, HTTPSink,
+                            DROP_OLDEST, COALESCE)
+from ld2410_sim import SimulatedLD2410
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def measurement(distance=80):
+    sim = SimulatedLD2410(rate_hz=0)
+    sim.moving_distance = distance
+    sensor = ld2410.LD2410(sim)
+    sensor.parse_report(sim._report())
+    return sensor.meas
+
+
+#client MQTT local (umqtt / paho) : garde les messages, échoue sur demande
+class StandInClient() :
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.published = []
+        self.reconnects = 0
+
+    def publish(self, topic, payload, qos=0):
+        if self.failures :
+            self.failures -= 1
+            raise OSError("broker down")
+        self.published.append((topic, json.loads(payload)))
+
+    def connect(self):
+        self.reconnects += 1
+
+
+def test_drop_oldest_keeps_the_latest_messages():
+    queue = MessageQueue(3, DROP_OLDEST)
+    for k in range(5):
+        queue.put("a", {"k": k}, k)
+    assert queue.dropped == 2
+    assert [item[2]["k"] for item in queue.get_batch(10)] == [2, 3, 4]
+    assert not queue.event.is_set()
+
+
+def test_coalesce_keeps_one_message_per_sensor():
+    queue = MessageQueue(8, COALESCE)
+    for k in range(5):
+        queue.put("a", {"k": k}, k)
+        queue.put("b", {"k": -k}, k)
+    assert len(queue) == 2
+    assert queue.coalesced == 8
+    assert [(item[0], item[2]["k"]) for item in queue.get_batch(10)] == [("a", 4), ("b", -4)]
+    queue.put("a", {"k": 9}, 9) #plus de message en attente pour "a" : nouvelle entrée
+    assert len(queue) == 1
+
+
+def test_delta_encoder_sends_changed_fields_and_keyframes():
+    encoder = DeltaEncoder(keyframe_every=3)
+    first = encoder.encode("a", 0, {"x": 1, "y": 2})
+    second = encoder.encode("a", 1, {"x": 1, "y": 3})
+    third = encoder.encode("a", 2, {"x": 1, "y": 3})
+    fourth = encoder.encode("a", 3, {"x": 1, "y": 3})
+    assert first == {"id": "a", "t": 0, "key": 1, "x": 1, "y": 2}
+    assert second == {"id": "a", "t": 1, "y": 3}
+    assert third == {"id": "a", "t": 2}
+    assert fourth["key"] == 1
+
+
+def test_file_sink_receives_batches(tmp_path):
+    path = str(tmp_path / "publish.jsonl")
+    publisher = Publisher(FileSink(path), MessageQueue(64), batch_size=4)
+    for k in range(10):
+        publisher.offer("salon", measurement(50 + k), k)
+    assert run(publisher.flush()) == 10
+    with open(path) as f :
+        batches = [json.loads(line) for line in f]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batches[0][0]["key"] == 1
+    assert [msg["moving_distance"] for batch in batches for msg in batch] == list(range(50, 60))
+    assert publisher.stats()["sent"] == 10 and publisher.stats()["batches"] == 3
+
+
+def test_failed_sends_are_retried_with_a_keyframe():
+    client = StandInClient(failures=2)
+    publisher = Publisher(MQTTSink(client, "maison/ld2410"), MessageQueue(64), retry_ms=4)
+    publisher.offer("salon", measurement(), 0)
+    run(publisher.flush())
+    publisher.offer("salon", measurement(90), 1)
+    run(publisher.flush())
+    assert publisher.failures == 2
+    assert client.reconnects == 2 #avant chaque nouvel essai
+    messages = [msg for topic, batch in client.published for msg in batch]
+    assert messages[0]["key"] == 1
+    assert messages[1] == {"id": "salon", "t": 1, "moving_distance": 90}
+
+
+def test_http_timeout_counts_as_a_failure():
+    async def main():
+        async def silent(reader, writer):
+            await asyncio.sleep(1)
+            writer.close()
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        sink = HTTPSink("127.0.0.1", port, timeout_s=0.05)
+        publisher = Publisher(sink, MessageQueue(8), retry_ms=10)
+        publisher.offer("salon", measurement(), 0)
+        publisher.start()
+        await asyncio.sleep(0.4)
+        alive = publisher._task is not None and not publisher._task.done()
+        publisher.stop()
+        server.close()
+        return publisher.failures, alive
+    failures, alive = run(main())
+    assert failures >= 1
+    assert alive #la tâche d'envoi survit au timeout
+
+
+def test_http_sink_posts_json():
+    async def main():
+        received = []
+        async def handler(reader, writer):
+            headers = b''
+            while not headers.endswith(b'\r\n\r\n') :
+                headers += await reader.read(1)
+            length = int(headers.split(b'Content-Length: ')[1].split(b'\r\n')[0])
+            received.append(json.loads(await reader.readexactly(length)))
+            writer.write(b'HTTP/1.0 204 No Content\r\n\r\n')
+            await writer.drain()
+            writer.close()
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        publisher = Publisher(HTTPSink("127.0.0.1", port, "/ld2410"), MessageQueue(8))
+        publisher.offer("salon", measurement(), 0)
+        await publisher.flush()
+        server.close()
+        return received, publisher.failures
+    received, failures = run(main())
+    assert failures == 0
+    assert received[0][0]["moving_distance"] == 80
+
+
+#lecture du simulateur -> offer -> tâche d'envoi, sans bloquer la lecture
+def test_pipeline_from_simulator(tmp_path):
+    path = str(tmp_path / "publish.jsonl")
+    async def main():
+        sim = SimulatedLD2410(rate_hz=200)
+        sensor = ld2410.LD2410(sim)
+        publisher = Publisher(FileSink(path), MessageQueue(256), batch_size=10, batch_ms=10)
+        publisher.start()
+        offered = 0
+        for k in range(30):
+            if sensor.read_reports() :
+                publisher.offer("salon", sensor.meas)
+                offered += 1
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.05)
+        publisher.stop()
+        return offered, publisher.sent
+    offered, sent = run(main())
+    assert offered > 0
+    assert sent == offered
+    with open(path) as f :
+        assert sum(len(json.loads(line)) for line in f) == sent
@@ -0,0 +1,137 @@
+# ld2410_supervisor.Supervisor contre le simulateur, sur une horloge simulée
+# (utime et le simulateur partagent la même horloge : les attentes sont instantanées)
+import pytest
+
+import ld2410
+import ld2410_supervisor
+from ld2410_sim import SimulatedLD2410
+
+
+class Clock() :
+
+    def __init__(self):
+        self.ms = 100000
+
+    def ticks_ms(self):
+        return self.ms
+
+    def sleep_ms(self, ms):
+        self.ms += ms
+
+    def seconds(self):
+        return self.ms / 1000
+
+
+#module bloqué (plus aucune trame) que seul reboot_module débloque
+class HungLD2410(SimulatedLD2410) :
+
+    def reboot(self):
+        self.rate_hz = 10
+        SimulatedLD2410.reboot(self)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ld2410.utime, "ticks_ms", clock.ticks_ms)
+    monkeypatch.setattr(ld2410.utime, "sleep_ms", clock.sleep_ms)
+    return clock
+
+
+def supervise(clock, sim, events, **kwargs):
+    sensor = ld2410.LD2410(sim)
+    callback = lambda event, step, recovery_ms : events.append((event, step, clock.ms))
+    return ld2410_supervisor.Supervisor(sensor, max_frame_age_ms=500, check_ms=100, verify_ms=300,
+                                        boot_ms=1000, backoff_ms=1000, callback=callback, **kwargs)
+
+
+#poll toutes les 10 ms pendant duration_ms, rend le nb de trames
+def run(supervisor, clock, duration_ms):
+    frames = 0
+    end = clock.ms + duration_ms
+    while clock.ms < end :
+        clock.ms += 10
+        frames += supervisor.poll(clock.ms)
+    return frames
+
+
+def test_module_stuck_in_config_mode_is_recovered_by_config_step(clock):
+    sim = SimulatedLD2410(rate_hz=20, clock=clock.seconds)
+    events = []
+    supervisor = supervise(clock, sim, events)
+    assert run(supervisor, clock, 1000) > 0
+    assert events == []
+    sim.config_mode = True #le module n'émet plus
+    run(supervisor, clock, 3000)
+    assert [(event, step) for event, step, ms in events] == [("stall", None), ("recovered", "config")]
+    stats = supervisor.stats()
+    assert (stats["reason"], stats["recoveries"], stats["failures"]) == ("frame age", 1, 0)
+    assert stats["recovered_by"] == {"resync": 0, "config": 1, "reboot": 0}
+    assert not sim.config_mode and not supervisor.sensor.communication_error
+    assert run(supervisor, clock, 1000) > 0
+
+
+def test_hang_cleared_only_by_reboot(clock):
+    sim = HungLD2410(rate_hz=20, boot_time=0.2, clock=clock.seconds)
+    events = []
+    supervisor = supervise(clock, sim, events)
+    run(supervisor, clock, 1000)
+    sim.rate_hz = 0
+    run(supervisor, clock, 4000)
+    assert [(event, step) for event, step, ms in events] == [("stall", None), ("recovered", "reboot")]
+    assert supervisor.stats()["recovered_by"]["reboot"] == 1
+    assert supervisor.stats()["last_recovery_ms"] >= 2 * 300 #étapes 0 et 1 essayées d'abord
+    assert run(supervisor, clock, 1000) > 0
+
+
+def test_dead_link_fails_and_stays_stalled(clock):
+    sim = SimulatedLD2410(rate_hz=20, clock=clock.seconds)
+    events = []
+    supervisor = supervise(clock, sim, events, jitter=0)
+    run(supervisor, clock, 1000)
+    sim.set_baudrate(115200) #liaison morte : octets illisibles, commandes ignorées
+    run(supervisor, clock, 3000)
+    assert [event for event, step, ms in events] == ["stall", "failed"]
+    stats = supervisor.stats()
+    assert stats["stalled"] and stats["failures"] == 1 and stats["recoveries"] == 0
+    assert supervisor.sensor.communication_error == 1
+    assert stats["backoff_ms"] == 2000
+
+
+def test_backoff_doubles_up_to_the_maximum(clock):
+    sim = SimulatedLD2410(rate_hz=0, clock=clock.seconds)
+    events = []
+    supervisor = supervise(clock, sim, events, jitter=0, max_backoff_ms=4000)
+    sim.set_baudrate(115200)
+    run(supervisor, clock, 40000)
+    times = [ms for event, step, ms in events]
+    assert events[0][0] == "stall" and all(event == "failed" for event, step, ms in events[1:])
+    cycle = times[2] - times[1] - 1000 #durée d'un cycle de récupération (sans le délai)
+    gaps = [times[k + 1] - times[k] - cycle for k in range(1, len(times) - 1)]
+    assert gaps[:4] == [1000, 2000, 4000, 4000]
+    assert supervisor.stats()["backoff_ms"] == 4000
+
+
+def test_jitter_spreads_attempts(clock, monkeypatch):
+    draws = []
+    def randint(low, high):
+        draws.append((low, high))
+        return high #aléa au maximum
+    monkeypatch.setattr(ld2410_supervisor.random, "randint", randint)
+    sim = SimulatedLD2410(rate_hz=0, clock=clock.seconds)
+    events = []
+    supervisor = supervise(clock, sim, events, jitter=0.25)
+    sim.set_baudrate(115200)
+    attempts = []
+    recover = supervisor.recover
+    def timed_recover():
+        attempts.append(clock.ms)
+        return recover()
+    supervisor.recover = timed_recover
+    run(supervisor, clock, 15000)
+    assert draws[:3] == [(-250, 250), (-250, 250), (-500, 500)]
+    stall = events[0][2]
+    assert 1250 <= attempts[0] - stall < 1250 + 10 #premier essai décalé aussi
+    failed = [ms for event, step, ms in events if event == "failed"]
+    assert 1250 <= attempts[1] - failed[0] < 1250 + 10
+    assert 2500 <= attempts[2] - failed[1] < 2500 + 10
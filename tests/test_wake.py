@@ -0,0 +1,46 @@
+# ld2410_wake.OutPinWakeup avec SimulatedPin et le simulateur
+import ld2410
+from ld2410_sim import SimulatedLD2410, SimulatedPin
+from ld2410_wake import OutPinWakeup
+
+
+class Clock() :
+
+    def __init__(self):
+        self.ms = 0
+
+    def seconds(self):
+        return self.ms / 1000
+
+
+def test_out_pin_wakes_reading_and_goes_idle_after_debounce():
+    clock = Clock()
+    sim = SimulatedLD2410(rate_hz=20, clock=clock.seconds)
+    sensor = ld2410.LD2410(sim)
+    pin = SimulatedPin(0)
+    wake = OutPinWakeup(sensor, pin, debounce_ms=50)
+    wake.arm()
+    clock.ms += 800
+    assert wake.poll(clock.ms) == 0 and wake.idle
+    assert sim.any() > 0 #trames accumulées pendant la veille : UART non lue
+    assert sensor.stats_data.frames == 0
+    pin.value(1) #front montant : présence
+    assert wake.poll(clock.ms) == 0 #trames accumulées jetées
+    assert not wake.idle and wake.wakeups == 1
+    assert sim.any() == 0 and sensor.stats_data.frames == 0
+    clock.ms += 200
+    assert wake.poll(clock.ms) == 4 #trames récentes seulement
+    pin.value(0)
+    clock.ms += 20
+    assert wake.poll(clock.ms) > 0 #anti-rebond : lecture maintenue
+    clock.ms += 20
+    wake.poll(clock.ms)
+    assert not wake.idle and wake.wakeups == 1
+    clock.ms += 10
+    assert wake.poll(clock.ms) == 0 and wake.idle #OUT à 0 depuis debounce_ms
+    frames = sensor.stats_data.frames
+    clock.ms += 500
+    assert wake.poll(clock.ms) == 0 and sensor.stats_data.frames == frames
+    wake.disarm()
+    pin.value(1)
+    assert wake.poll(clock.ms) == 0 and wake.idle #plus d'interruption